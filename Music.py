@@ -1,10 +1,26 @@
+import os
 import streamlit as st
+import numpy as np
 import pandas as pd
 import joblib
 import plotly.express as px
 import plotly.graph_objects as go
 from pathlib import Path
-from fuzzywuzzy import process  # For improved search functionality
+from recommender import RecommendationEngine, diverse_recommendations
+from ann_index import IVFPQIndex, StaleIndexError
+from catalog import track_records
+from column_index import PAGE_SIZE, page
+from ingest import LiveCatalog
+from model_bundle import ModelBundle, StaleBundleError, dataset_fingerprint, load_bundle
+from preprocessing import FEATURES
+from analytics import Analytics
+from result_cache import ResultCache, cache_version, index_version, model_version
+from taste_profile import TasteProfile
+from playlist_generator import PlaylistGenerator
+from library import LibraryStore, new_user_id, valid_user_id
+from entities import ENTITIES, EntityService
+from genre_vectors import GenreVectors, HybridEngine
+from metrics import METRICS, SlowRerunProfiler, serve
 
 # Set Page Configuration
 st.set_page_config(
@@ -86,40 +102,166 @@ current_dir = Path(__file__).parent if "__file__" in locals() else Path.cwd()
 
 logo_path = current_dir / "logo.png"
 logo_exists = logo_path.exists()
-# Load Data Function with enhanced caching
-@st.cache_data(show_spinner=False)
+# Load Data Function with enhanced caching.
+# One process-wide LiveCatalog serves the memory-mapped copy written by catalog.py when it is fresh.
+# When ingest.py publishes a new revision, the next rerun gets a new snapshot with incrementally
+# updated indexes, while reruns already in progress finish on the old one.
+@st.cache_resource(show_spinner=False)
+def load_live_catalog():
+    return LiveCatalog(current_dir)
+
+
 def load_data():
     try:
-        data_path = current_dir / "data" / "data.csv"
-        return pd.read_csv(data_path, encoding='utf-8')
+        # Only slow when a new revision was published since the last rerun
+        with METRICS.stage("load_data"):
+            return load_live_catalog().current()
     except Exception as e:
         st.error(f"Error loading datasets: {e}")
         return None
 
 
-# Load Models Function with version check
-@st.cache_resource(show_spinner=False)
-def load_models():
+# Load Models Function with version check.
+# Prefers the versioned bundle written by the notebook; the legacy pickle is only a fallback.
+@st.cache_resource(show_spinner=False, max_entries=1)
+@METRICS.timed("load_models")
+def load_models(revision, _data):
     try:
+        bundle_path = current_dir / "data_model"
+        if (bundle_path / "manifest.json").exists():
+            return load_bundle(bundle_path, _data)
         model_path = current_dir / "data_model.pkl"
         return joblib.load(model_path)
+    except StaleBundleError as e:
+        st.error(f"Model bundle rejected: {e}")
+        return None
     except Exception as e:
         st.error(f"Error loading model: {e}")
         return None
 
 
+# Normalized feature matrix for cosine top-k, built once per catalog revision.
+# Set AMUSIC_INDEX=ivfpq to serve from the approximate index built by ann_index.py;
+# ``search_version`` changes when that file is rebuilt or AMUSIC_NPROBE changes.
+@st.cache_resource(show_spinner=False, max_entries=1)
+@METRICS.timed("load_engine")
+def load_engine(revision, search_version, _data, _model):
+    try:
+        if os.environ.get("AMUSIC_INDEX", "exact") == "ivfpq":
+            index_path = current_dir / "data_model_ivfpq.npz"
+            if index_path.exists():
+                try:
+                    return IVFPQIndex.load(index_path, nprobe=int(os.environ.get("AMUSIC_NPROBE", 8)), data=_data)
+                except StaleIndexError:
+                    st.warning("Approximate index is older than the catalog, falling back to exact search.")
+            else:
+                st.warning("Approximate index not found, falling back to exact search.")
+        if isinstance(_model, ModelBundle):
+            return RecommendationEngine.from_bundle(_model, _data)
+        return RecommendationEngine.from_model(_data, _model)
+    except Exception as e:
+        st.error(f"Error building recommendation engine: {e}")
+        return None
+
+
+# Fingerprint of the loaded catalog, used to key caches built on top of it
+@st.cache_resource(show_spinner=False, max_entries=1)
+def dataset_version(revision, _data):
+    return dataset_fingerprint(_data, [c for c in FEATURES if c in _data.columns])
+
+
+# Dashboard summaries, computed once per dataset version
+@st.cache_resource(show_spinner=False, max_entries=1)
+@METRICS.timed("load_analytics")
+def load_analytics(version, _data):
+    return Analytics(_data, version, current_dir)
+
+
+# Recommendation and search results, one cache per catalog/model/index version.
+# Set AMUSIC_CACHE_DIR to keep warm results on disk across restarts.
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_result_cache(version):
+    return ResultCache(version, disk_dir=os.environ.get("AMUSIC_CACHE_DIR"))
+
+
+# Artist/genre/era engines, each loaded the first time it is used
+@st.cache_resource(show_spinner=False)
+def load_entity_service():
+    return EntityService(current_dir)
+
+
+# Scaled and normalized features for playlist sequencing, built once per catalog revision
+@st.cache_resource(show_spinner=False, max_entries=1)
+@METRICS.timed("load_playlist_generator")
+def load_playlist_generator(revision, _data, _scaler):
+    return PlaylistGenerator(_data, _scaler)
+
+
+# Sparse track genres for the Genre Weight blend, built the first time it is used per catalog revision
+@st.cache_resource(show_spinner=False, max_entries=1)
+@METRICS.timed("load_genre_vectors")
+def load_genre_vectors(revision, _data, _engine):
+    try:
+        return GenreVectors.load(current_dir, _data, _engine)
+    except Exception as e:
+        st.error(f"Error loading genre data: {e}")
+        return None
+
+
+# Set AMUSIC_METRICS_PORT to serve the stage metrics at /metrics (Prometheus) and /metrics.json
+@st.cache_resource(show_spinner=False)
+def start_metrics_server():
+    port = os.environ.get("AMUSIC_METRICS_PORT")
+    return serve(METRICS, int(port), os.environ.get("AMUSIC_METRICS_HOST", "127.0.0.1")) if port else None
+
+
+# Set AMUSIC_PROFILE_DIR to keep sampled stacks of the slowest reruns there
+@st.cache_resource(show_spinner=False)
+def load_profiler():
+    profile_dir = os.environ.get("AMUSIC_PROFILE_DIR")
+    return SlowRerunProfiler(profile_dir) if profile_dir else None
+
+
+# Time this rerun; the stages below are recorded inside it
+start_metrics_server()
+rerun_timing = METRICS.start("rerun")
+profiler = load_profiler()
+rerun_sampler = profiler.start() if profiler is not None else None
+
 # Initialize Session State
 session_defaults = {
-    "favorites": [],
-    "playlist": [],
     "recent_searches": []
 }
 for key, value in session_defaults.items():
     st.session_state.setdefault(key, value)
 
+# Per-user library, kept in the URL so it survives new sessions
+if "library" not in st.session_state:
+    # Ids not minted here (e.g. ``?user=../x``) get a fresh one; the id names the export directory
+    user_id = st.query_params.get("user")
+    if not valid_user_id(user_id):
+        user_id = new_user_id()
+    st.query_params["user"] = user_id
+    st.session_state.library = LibraryStore(current_dir / "library.sqlite3", user_id, current_dir / "exports")
+    st.session_state.favorites = st.session_state.library["favorites"]
+    st.session_state.playlist = st.session_state.library["playlist"]
+
 # Load Data and Models
-data = load_data()
-model = load_models()
+catalog = load_data()
+data = catalog.data if catalog is not None else None
+revision = catalog.revision if catalog is not None else None
+model = load_models(revision, data) if data is not None else None
+search_version = index_version(
+    current_dir / "data_model_ivfpq.npz" if os.environ.get("AMUSIC_INDEX", "exact") == "ivfpq" else None,
+    int(os.environ.get("AMUSIC_NPROBE", 8)),
+)
+engine = load_engine(revision, search_version, data, model) if data is not None and model is not None else None
+analytics = load_analytics(dataset_version(revision, data), data) if data is not None else None
+result_cache = load_result_cache(cache_version(
+    dataset_version(revision, data), model_version(model, current_dir / "data_model.pkl"), search_version,
+)) if data is not None else None
+if result_cache is not None:
+    METRICS.watch_cache("results", result_cache.stats)
 
 # Sidebar UI with enhanced styling
 with st.sidebar:
@@ -149,6 +291,9 @@ with st.sidebar:
         st.checkbox("Enable Explicit Content", False, help="Filter explicit content")
         st.checkbox("High Quality Streaming", True)
         st.slider("Volume", 0, 100, 75)
+        if result_cache is not None:
+            cache_stats = result_cache.stats()
+            st.caption(f"⚡ Result cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
 
     st.markdown("""
         <div style="margin-top: 2em; padding: 1em; background: #1F2937; border-radius: 12px;">
@@ -164,10 +309,6 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
 # Initialize Session State
-if "favorites" not in st.session_state:
-    st.session_state.favorites = []
-if "playlist" not in st.session_state:
-    st.session_state.playlist = []
 if "message" not in st.session_state:
     st.session_state.message = None  # Initialize the message variable
 # Enhanced Home Tab
@@ -198,12 +339,9 @@ if "Home" in selected_tab:
     with col2:
         if data is not None:
             st.markdown("### 📈 Music Trends Overview")
+            chart_timing = METRICS.start("charts")
             try:
-                trend_data = data.groupby('year').agg({
-                    'popularity': 'mean',
-                    'danceability': 'mean',
-                    'energy': 'mean'
-                }).reset_index()
+                trend_data = analytics.yearly_trends(('popularity', 'danceability', 'energy'))
 
                 fig = px.line(trend_data, x='year', y=['popularity', 'danceability', 'energy'],
                               labels={'value': 'Score', 'variable': 'Metric'},
@@ -220,105 +358,218 @@ if "Home" in selected_tab:
                 st.plotly_chart(fig, use_container_width=True)
             except Exception as e:
                 st.error(f"Couldn't generate trend chart: {e}")
+            chart_timing.stop()
 
 # Enhanced Recommendations Tab with multi-factor filtering
 import time  # Add this import at the top of your script
 
 # Initialize Session State
-if "favorites" not in st.session_state:
-    st.session_state.favorites = []
-if "playlist" not in st.session_state:
-    st.session_state.playlist = []
 if "message" not in st.session_state:
     st.session_state.message = None
 
 # Callback function for adding to favorites
-def add_to_favorites(song_name):
-    if song_name not in st.session_state.favorites:
-        st.session_state.favorites.append(song_name)
+def add_to_favorites(song_id, song_name):
+    if st.session_state.favorites.add(song_id):
         st.session_state.message = f"Added **{song_name}** to Favorites!"
     else:
         st.session_state.message = f"**{song_name}** is already in your Favorites!"
 
 # Callback function for adding to playlist
-def add_to_playlist(song_name):
-    if song_name not in st.session_state.playlist:
-        st.session_state.playlist.append(song_name)
+def add_to_playlist(song_id, song_name):
+    if st.session_state.playlist.add(song_id):
         st.session_state.message = f"Added **{song_name}** to Playlist!"
     else:
         st.session_state.message = f"**{song_name}** is already in your Playlist!"
 
-if "Recommendations" in selected_tab:
-    st.markdown("## 🎯 Smart Recommendations")
-    if data is not None and model is not None:
-        with st.expander("⚙️ Recommendation Settings", expanded=True):
-            col1, col2, col3 = st.columns(3)
+# Catalog rows for stored song ids, in the order given
+def resolve_songs(song_ids):
+    songs = pd.DataFrame({"id": song_ids, "Song": song_ids, "Artists": ""})
+    if data is None:
+        return songs
+    rows = catalog.id_index.get_indexer(song_ids)
+    found = rows >= 0
+    songs.loc[found, "Song"] = data["name"].take(rows[found]).to_numpy()
+    songs.loc[found, "Artists"] = data["artists"].take(rows[found]).to_numpy()
+    return songs
+
+# Recommendation cards with Favorites/Playlist buttons, read straight from the catalog rows
+def show_recommendations(rows):
+    card_timing = METRICS.start("render_cards", len(rows))
+    for track in track_records(data, rows):
+        with st.container():
+            col1, col2, col3 = st.columns([1, 4, 2])
             with col1:
-                song_name = st.selectbox("Seed Song", data["name"].unique())
+                st.markdown(f"<div class='hover-glow' style='font-size: 3em;'>🎵</div>",
+                            unsafe_allow_html=True)
             with col2:
-                top_n = st.slider("Number of Recommendations", 5, 20, 10)
+                st.markdown(f"""
+                    <div class="card">
+                        <h4>{track.name}</h4>
+                        <p style="color: #94A3B8;">{track.artists}</p>
+                        <div style="display: flex; flex-wrap: wrap;">
+                            <span class="feature-badge">🎶 {track.tempo:.0f} BPM</span>
+                            <span class="feature-badge">💃 {track.danceability * 100:.0f}% Dance</span>
+                            <span class="feature-badge">🔥 {track.energy * 100:.0f}% Energy</span>
+                        </div>
+                    </div>
+                """, unsafe_allow_html=True)
             with col3:
-                diversity = st.slider("Diversity", 0.0, 1.0, 0.7,
-                                      help="Balance between similarity and variety")
+                # Add to Favorites and Playlist buttons
+                if st.button("❤️ Add to Favorites", key=f"fav_{track.id}", on_click=add_to_favorites, args=(track.id, track.name)):
+                    pass  # The callback function handles the logic
+
+                if st.button("➕ Add to Playlist", key=f"add_{track.id}", on_click=add_to_playlist, args=(track.id, track.name)):
+                    pass  # The callback function handles the logic
+    card_timing.stop()
+
+# Taste profile over the favorites, updated with only what changed since the last rerun
+def taste_profile(n_clusters):
+    profile = st.session_state.get("taste_profile")
+    if profile is None or profile.engine is not engine or profile.n_clusters != n_clusters:
+        profile = TasteProfile(engine, n_clusters)
+        st.session_state.taste_profile = profile
+    rows = catalog.id_index.get_indexer(list(st.session_state.favorites))
+    return profile.sync(rows[rows >= 0].tolist())
+
+# Typeahead seed picker: only the best matches for what was typed reach the browser
+def seed_picker(label, key):
+    typeahead = catalog.typeahead
+    query = st.text_input(label, key=f"{key}_query", placeholder="Type a title or artist")
+    rows = typeahead.complete(query)
+    if not len(rows):
+        st.caption("No songs match.")
+        return None
+    ids = data["id"].take(rows).tolist()
+    labels = dict(zip(ids, (typeahead.label(row) for row in rows)))
+    song_id = st.selectbox("Matches", ids, format_func=labels.get, key=key, label_visibility="collapsed")
+    return catalog.id_index.get_loc(song_id)
 
-        if st.button("Generate Recommendations", key="rec_gen"):
-            with st.spinner("🎧 Analyzing your music taste..."):
-                try:
-                    # Find the index of the selected song
-                    idx = data.index[data["name"] == song_name].tolist()[0]
-
-                    # Ensure the query point has valid feature names
-                    query_point = data.loc[idx, model.feature_names_in_].values.reshape(1, -1)
-                    query_point = pd.DataFrame(query_point, columns=model.feature_names_in_)  # Add feature names
-
-                    # Get recommendations
-                    distances, indices = model.kneighbors(query_point, n_neighbors=top_n * 2)
-
-                    # Apply diversity filtering
-                    rec_indices = [indices[0][0]]
-                    for i in indices[0][1:]:
-                        if len(rec_indices) >= top_n:
-                            break
-                        if data.iloc[i]['name'] != song_name:
-                            rec_indices.append(i)
-
-                    recommendations = data.iloc[rec_indices[:top_n]]
-
-                    # Display recommendations with audio features
-                    st.markdown(f"### 🎧 Recommendations based on *{song_name}*")
-                    for _, row in recommendations.iterrows():
-                        with st.container():
-                            col1, col2, col3 = st.columns([1, 4, 2])
-                            with col1:
-                                st.markdown(f"<div class='hover-glow' style='font-size: 3em;'>🎵</div>",
-                                            unsafe_allow_html=True)
-                            with col2:
-                                st.markdown(f"""
-                                    <div class="card">
-                                        <h4>{row['name']}</h4>
-                                        <p style="color: #94A3B8;">{row['artists']}</p>
-                                        <div style="display: flex; flex-wrap: wrap;">
-                                            <span class="feature-badge">🎶 {row['tempo']:.0f} BPM</span>
-                                            <span class="feature-badge">💃 {row['danceability'] * 100:.0f}% Dance</span>
-                                            <span class="feature-badge">🔥 {row['energy'] * 100:.0f}% Energy</span>
-                                        </div>
-                                    </div>
-                                """, unsafe_allow_html=True)
-                            with col3:
-                                # Add to Favorites and Playlist buttons
-                                if st.button("❤️ Add to Favorites", key=f"fav_{row['id']}", on_click=add_to_favorites, args=(row['name'],)):
-                                    pass  # The callback function handles the logic
-
-                                if st.button("➕ Add to Playlist", key=f"add_{row['id']}", on_click=add_to_playlist, args=(row['name'],)):
-                                    pass  # The callback function handles the logic
-                except Exception as e:
-                    st.error(f"Recommendation error: {str(e)}")
+if "Recommendations" in selected_tab:
+    st.markdown("## 🎯 Smart Recommendations")
+    if data is not None and engine is not None:
+        rec_mode = st.radio("Recommend from", ["🎵 Seed Song", "✨ For You"], horizontal=True,
+                            help="For You builds a taste profile from all of your favorites")
+
+        if "For You" in rec_mode:
+            with st.expander("⚙️ Recommendation Settings", expanded=True):
+                col1, col2 = st.columns(2)
+                with col1:
+                    top_n = st.slider("Number of Recommendations", 5, 20, 10)
+                with col2:
+                    n_clusters = st.slider("Taste Clusters", 1, 5, 1,
+                                           help="Split your favorites into several tastes")
+
+            if not st.session_state.favorites:
+                st.info("Add some songs to your favorites to get personal recommendations.")
+            elif st.button("Generate For You", key="rec_for_you"):
+                with st.spinner("🎧 Analyzing your music taste..."):
+                    try:
+                        with METRICS.stage("recommend_for_you", len(engine)):
+                            profile = taste_profile(n_clusters)
+                            rec_indices, _ = profile.recommend(top_n)
+                        st.markdown(f"### ✨ For You, based on {len(profile)} favorites")
+                        show_recommendations(rec_indices)
+                    except Exception as e:
+                        st.error(f"Recommendation error: {str(e)}")
+        else:
+            with st.expander("⚙️ Recommendation Settings", expanded=True):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    seed_row = seed_picker("Seed Song", "rec_seed")
+                with col2:
+                    top_n = st.slider("Number of Recommendations", 5, 20, 10)
+                with col3:
+                    diversity = st.slider("Diversity", 0.0, 1.0, 0.7,
+                                          help="Balance between similarity and variety")
+
+                # Only ranges narrower than the whole catalog are applied
+                rec_ranges = {}
+                if st.checkbox("Filter by year, tempo and popularity", key="rec_filter"):
+                    filter_cols = st.columns(3)
+                    for column, label, filter_col in zip(["year", "tempo", "popularity"],
+                                                         ["Year", "Tempo (BPM)", "Popularity"], filter_cols):
+                        if column in catalog.column_index:
+                            low, high = int(np.floor(data[column].min())), int(np.ceil(data[column].max()))
+                            with filter_col:
+                                bounds = st.slider(label, low, high, (low, high), key=f"rec_{column}_range")
+                            if bounds != (low, high):
+                                rec_ranges[column] = bounds
+
+                # Genre overlap needs the exact engine's feature matrix
+                genre_weight = 0.0
+                if isinstance(engine, RecommendationEngine) and GenreVectors.available(current_dir):
+                    genre_weight = st.slider("Genre Weight", 0.0, 1.0, 0.0, key="rec_genre_weight",
+                                             help="Blend in how many genres a song shares with the seed")
+
+            if st.button("Generate Recommendations", key="rec_gen", disabled=seed_row is None):
+                with st.spinner("🎧 Analyzing your music taste..."):
+                    try:
+                        # The selected song, and every other track with the same title to leave out
+                        idx = seed_row
+                        song_name = data["name"].iat[idx]
+                        same_name = catalog.typeahead.rows_named(song_name)
+
+                        rec_engine = engine
+                        if genre_weight > 0:
+                            genre_vectors = load_genre_vectors(revision, data, engine)
+                            if genre_vectors is not None:
+                                rec_engine = HybridEngine(engine, genre_vectors, genre_weight)
+
+                        # Re-rank the nearest candidates for variety with the diversity slider
+                        # Filters are applied inside the search, so a full list comes back whenever enough songs match
+                        def recommend():
+                            with METRICS.stage("recommend", len(engine)):
+                                return diverse_recommendations(rec_engine, idx, top_n, diversity, exclude=same_name,
+                                                               column_index=catalog.column_index,
+                                                               ranges=rec_ranges)[0]
+
+                        rec_indices = result_cache.get_or_compute(
+                            ("recommend", int(idx), top_n, diversity, tuple(sorted(rec_ranges.items())),
+                             genre_weight if rec_engine is not engine else 0.0),
+                            recommend,
+                        )
+                        if len(rec_indices) < top_n:
+                            st.info(f"Only {len(rec_indices)} songs match these filters.")
+
+                        # Display recommendations with audio features
+                        st.markdown(f"### 🎧 Recommendations based on *{song_name}*")
+                        show_recommendations(rec_indices)
+                    except Exception as e:
+                        st.error(f"Recommendation error: {str(e)}")
 
     # Display the message at the top of the page
     if st.session_state.message:
         st.success(st.session_state.message)
         st.session_state.message = None  # Clear the message after displaying
 
+    # Similar artists, genres and eras from the per-aggregate models
+    entity_service = load_entity_service()
+    entity_types = entity_service.available()
+    # Nothing is loaded until the section is switched on
+    if entity_types and st.checkbox("🧭 Explore Similar Artists, Genres & Eras"):
+        with st.container():
+            entity_labels = {"artist": "🎤 Artists", "genre": "🎼 Genres", "year": "📅 Eras"}
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                entity_type = st.selectbox("Explore by", entity_types, format_func=entity_labels.get)
+            with col2:
+                entity_key = st.selectbox("Starting point", entity_service.names(entity_type))
+            with col3:
+                entity_top_n = st.slider("Number of Results", 3, 15, 5)
+
+            try:
+                similar = entity_service.similar(entity_type, entity_key, entity_top_n)
+                column = ENTITIES[entity_type][1]
+                for key, score in zip(similar[column], similar["similarity"]):
+                    st.markdown(f"""
+                        <div class="card">
+                            <h4>{key}</h4>
+                            <span class="feature-badge">🔗 {score * 100:.1f}% similar</span>
+                        </div>
+                    """, unsafe_allow_html=True)
+            except Exception as e:
+                st.error(f"Couldn't find similar {entity_labels[entity_type].split()[-1].lower()}: {e}")
+
 # Enhanced Search with fuzzy matching
 if "Advanced Search" in selected_tab:
     st.markdown("## 🔍 Advanced Music Search")
@@ -352,31 +603,38 @@ if "Advanced Search" in selected_tab:
                 st.warning("Tempo information not available in the dataset.")
                 bpm_range = (80, 120)  # Default values
 
+        # Fuzzy matching on trigram candidates only, then the year and tempo filters (if columns exist)
+        filter_ranges = {"year": year_range, "tempo": bpm_range}
+
+        def search_rows():
+            with METRICS.stage("search") as timing:
+                candidates = catalog.search_index.search(search_query)
+                timing.rows = len(candidates)
+            with METRICS.stage("filter", len(candidates)):
+                return catalog.column_index.filter(filter_ranges, candidates)
+
         # Apply Filters
         if search_query:
-            # Fuzzy matching for better search
-            choices = data['name'] + " - " + data['artists']
-            matches = process.extract(search_query, choices, limit=20)
-            matched_indices = [match[2] for match in matches if match[1] > 60]  # Extract indices from matches
-            search_results = data.iloc[matched_indices]
+            search_key = ("search", search_query, tuple(year_range), tuple(bpm_range))
+            result_rows = result_cache.get_or_compute(search_key, search_rows)
         else:
-            search_results = data
-
-        # Apply year and tempo filters (if columns exist)
-        if 'year' in data.columns:
-            search_results = search_results[search_results['year'].between(*year_range)]
-        if 'tempo' in data.columns:
-            search_results = search_results[search_results['tempo'].between(*bpm_range)]
+            with METRICS.stage("filter", len(data)):
+                result_rows = catalog.column_index.filter(filter_ranges)
 
         # Display Results
-        if not search_results.empty:
-            st.markdown(f"### 🎵 Found {len(search_results)} songs")
-
-            # Limit the number of results displayed initially
-            num_results_to_show = min(10, len(search_results))
-            st.markdown(f"Showing **{num_results_to_show}** results. Use the search bar to refine your results.")
-
-            for _, row in search_results.head(num_results_to_show).iterrows():
+        if len(result_rows):
+            st.markdown(f"### 🎵 Found {len(result_rows)} songs")
+
+            # Rows loaded so far for this query and filters; only these are materialized
+            results_key = (search_query, tuple(year_range), tuple(bpm_range))
+            if st.session_state.get("search_results_key") != results_key:
+                st.session_state.search_results_key = results_key
+                st.session_state.search_cursor = PAGE_SIZE
+            shown_rows, next_cursor = page(result_rows, 0, st.session_state.search_cursor)
+            st.markdown(f"Showing **{len(shown_rows)}** results. Use the search bar to refine your results.")
+
+            card_timing = METRICS.start("render_cards", len(shown_rows))
+            for track in track_records(data, shown_rows):
                 with st.container():
                     col1, col2, col3 = st.columns([1, 4, 2])
                     with col1:
@@ -386,21 +644,24 @@ if "Advanced Search" in selected_tab:
                         # Display song details
                         st.markdown(f"""
                             <div class="card">
-                                <h4>{row['name']}</h4>
+                                <h4>{track.name}</h4>
                                 <p style="color: #94A3B8;">
-                                    {row['artists']} • {row['year'] if 'year' in data.columns else 'N/A'}
+                                    {track.artists} • {track.year if 'year' in data.columns else 'N/A'}
                                 </p>
                             </div>
                         """, unsafe_allow_html=True)
                     with col3:
-                        if st.button("➕ Add to Playlist", key=f"add_{row['id']}"):
-                            st.session_state.playlist.append(row['name'])
-                            st.success(f"Added **{row['name']}** to playlist!")
+                        if st.button("➕ Add to Playlist", key=f"add_{track.id}"):
+                            if st.session_state.playlist.add(track.id):
+                                st.success(f"Added **{track.name}** to playlist!")
+                            else:
+                                st.info(f"**{track.name}** is already in your playlist!")
+            card_timing.stop()
 
             # Show a "Load More" button if there are more results
-            if len(search_results) > num_results_to_show:
+            if next_cursor is not None:
                 if st.button("Load More Results"):
-                    num_results_to_show = min(num_results_to_show + 10, len(search_results))
+                    st.session_state.search_cursor = next_cursor + PAGE_SIZE  # One more page
                     st.rerun()
         else:
             st.warning("No matching songs found. Try adjusting your search or filters.")
@@ -430,10 +691,11 @@ if "Music Insights" in selected_tab:
             list(viz_options.keys()),
             format_func=lambda x: f"{viz_options[x]} {x}"
         )
+        chart_timing = METRICS.start("charts")
 
         # Genre Distribution (only if 'genre' column exists)
         if viz_choice == "Genre Distribution" and 'genre' in data.columns:
-            genre_counts = data['genre'].value_counts().nlargest(15)
+            genre_counts = analytics.top_values('genre', 15)
             fig = px.bar(
                 genre_counts,
                 orientation='h',
@@ -459,7 +721,7 @@ if "Music Insights" in selected_tab:
             if missing_features:
                 st.warning(f"Missing features: {', '.join(missing_features)}. Cannot generate radar chart.")
             else:
-                avg_features = data[features].mean()
+                avg_features = analytics.feature_means(tuple(features))
                 fig = go.Figure()
                 fig.add_trace(go.Scatterpolar(
                     r=avg_features.values,
@@ -477,13 +739,13 @@ if "Music Insights" in selected_tab:
         # Song Duration Analysis
         elif viz_choice == "Song Duration Analysis":
             if 'duration_ms' in data.columns:
-                data['duration_min'] = data['duration_ms'] / 60000
-                fig = px.histogram(
-                    data,
-                    x='duration_min',
-                    nbins=50,
+                duration_bins = analytics.histogram('duration_ms', 50, 1 / 60000)
+                fig = px.bar(
+                    duration_bins,
+                    x='center',
+                    y='count',
                     title="Song Duration Distribution",
-                    labels={'duration_min': 'Duration (minutes)'}
+                    labels={'center': 'Duration (minutes)'}
                 )
                 fig.update_layout(
                     xaxis_title="Duration (minutes)",
@@ -505,7 +767,7 @@ if "Music Insights" in selected_tab:
                 )
 
                 if selected_features:
-                    corr_matrix = data[selected_features + ['popularity']].corr()
+                    corr_matrix = analytics.correlation(tuple(selected_features + ['popularity']))
                     fig = px.imshow(
                         corr_matrix,
                         text_auto=True,
@@ -525,12 +787,13 @@ if "Music Insights" in selected_tab:
             )
 
             if feature in data.columns:
-                fig = px.histogram(
-                    data,
-                    x=feature,
-                    nbins=50,
+                feature_bins = analytics.histogram(feature, 50)
+                fig = px.bar(
+                    feature_bins,
+                    x='center',
+                    y='count',
                     title=f"Distribution of {feature.capitalize()}",
-                    labels={feature: feature.capitalize()}
+                    labels={'center': feature.capitalize()}
                 )
                 fig.update_layout(
                     xaxis_title=feature.capitalize(),
@@ -555,17 +818,33 @@ if "Music Insights" in selected_tab:
                     ['danceability', 'energy', 'acousticness', 'valence', 'tempo', 'loudness']
                 )
 
+            show_points = st.checkbox("Show sampled songs instead of density", False,
+                                      help="Plots a stratified sample of 5,000 songs")
+
             if x_feature in data.columns and y_feature in data.columns:
-                fig = px.scatter(
-                    data,
-                    x=x_feature,
-                    y=y_feature,
-                    title=f"{x_feature.capitalize()} vs {y_feature.capitalize()}",
-                    labels={
-                        x_feature: x_feature.capitalize(),
-                        y_feature: y_feature.capitalize()
-                    }
-                )
+                # Binned on the server; only the grid or a small sample reaches the browser
+                if show_points and x_feature != y_feature:
+                    fig = px.scatter(
+                        analytics.stratified_sample(x_feature, y_feature, 5000),
+                        x=x_feature,
+                        y=y_feature,
+                        opacity=0.5,
+                        title=f"{x_feature.capitalize()} vs {y_feature.capitalize()}",
+                        labels={
+                            x_feature: x_feature.capitalize(),
+                            y_feature: y_feature.capitalize()
+                        }
+                    )
+                else:
+                    x_centers, y_centers, counts = analytics.grid(x_feature, y_feature, 60)
+                    fig = go.Figure(go.Heatmap(
+                        x=x_centers,
+                        y=y_centers,
+                        z=np.where(counts > 0, counts, np.nan),
+                        colorscale='Viridis',
+                        colorbar=dict(title="Songs")
+                    ))
+                    fig.update_layout(title=f"{x_feature.capitalize()} vs {y_feature.capitalize()}")
                 fig.update_layout(
                     xaxis_title=x_feature.capitalize(),
                     yaxis_title=y_feature.capitalize()
@@ -573,27 +852,30 @@ if "Music Insights" in selected_tab:
                 st.plotly_chart(fig, use_container_width=True)
             else:
                 st.warning(f"Required columns not found in the dataset.")
+        chart_timing.stop()
 
 # Favorites Tab
 elif "Favorites" in selected_tab:
     st.subheader("❤️ Your Favorites")
     if st.session_state.favorites:
-        for i, song in enumerate(st.session_state.favorites):
+        favorites_songs = resolve_songs(list(st.session_state.favorites))
+        for song_id, song, artists in favorites_songs[["id", "Song", "Artists"]].itertuples(index=False):
             col1, col2 = st.columns([5, 1])
             with col1:
-                st.markdown(f"<div class='card'>🎵 {song}</div>", unsafe_allow_html=True)
+                st.markdown(f"<div class='card'>🎵 {song} <span style='color: #94A3B8;'>{artists}</span></div>",
+                            unsafe_allow_html=True)
             with col2:
-                if st.button("Remove", key=f"remove_fav_{i}"):
-                    st.session_state.favorites.remove(song)
+                if st.button("Remove", key=f"remove_fav_{song_id}"):
+                    st.session_state.favorites.remove(song_id)
                     st.rerun()
 
         if st.button("Export Favorites"):
             try:
-                pd.DataFrame(st.session_state.favorites, columns=["Song"]).to_csv("favorites.csv", index=False)
-                st.success("Favorites exported as favorites.csv!")
+                export_path = st.session_state.library.export_csv("favorites", resolve_songs)
+                st.success(f"Favorites exported as {export_path.relative_to(current_dir)}!")
                 st.download_button(
                     label="Download CSV",
-                    data=pd.DataFrame(st.session_state.favorites, columns=["Song"]).to_csv(index=False).encode('utf-8'),
+                    data=export_path.read_bytes(),
                     file_name="favorites.csv",
                     mime="text/csv",
                 )
@@ -604,24 +886,92 @@ elif "Favorites" in selected_tab:
 
 # Playlist Tab
 elif "Playlist" in selected_tab:
+    if data is not None:
+        with st.expander("🪄 Generate a Smart Playlist", expanded=not st.session_state.playlist):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                seed_source = st.radio("Seed from", ["🎶 My Playlist", "❤️ My Favorites", "🎵 A Song"])
+                if "A Song" in seed_source:
+                    seed_row = seed_picker("Seed Song", "playlist_seed")
+                playlist_length = st.slider("Length", 10, 100, 30)
+            with col2:
+                energy_path = st.selectbox("Energy Path", ["Any", "Rising", "Falling", "Steady"])
+                energy_range = st.slider("Energy Range", 0.0, 1.0, (0.3, 0.8),
+                                         disabled=energy_path == "Any")
+                hold_tempo = st.checkbox("Hold Tempo")
+                tempo = st.slider("Tempo (BPM)", 60, 200, 120, disabled=not hold_tempo)
+            with col3:
+                tempo_tolerance = st.slider("Tempo Tolerance (± BPM)", 1, 20, 5, disabled=not hold_tempo)
+                variety = st.slider("Variety", 0.0, 1.0, 0.0, help="Random variation between generations")
+                playlist_seed = st.number_input("Random Seed", 0, 9999, 0)
+
+            if st.button("Generate Playlist", key="playlist_gen"):
+                if "A Song" in seed_source:
+                    seed_rows = np.array([] if seed_row is None else [seed_row], dtype=np.intp)
+                else:
+                    collection = st.session_state.playlist if "Playlist" in seed_source else st.session_state.favorites
+                    seed_rows = catalog.id_index.get_indexer(list(collection))
+                    seed_rows = seed_rows[seed_rows >= 0]
+
+                trajectory = {}
+                low, high = energy_range
+                if energy_path == "Rising":
+                    trajectory["energy"] = (low, high)
+                elif energy_path == "Falling":
+                    trajectory["energy"] = (high, low)
+                elif energy_path == "Steady":
+                    trajectory["energy"] = ((low + high) / 2, (low + high) / 2, (high - low) / 2)
+                if hold_tempo:
+                    trajectory["tempo"] = (tempo, tempo, tempo_tolerance)
+
+                if len(seed_rows) == 0:
+                    st.warning("Add some songs to this collection first, or pick a seed song.")
+                else:
+                    try:
+                        generator = load_playlist_generator(revision, data, getattr(engine, "scaler", None))
+                        with METRICS.stage("playlist", len(data)):
+                            rows = generator.generate(seed_rows, playlist_length, trajectory,
+                                                      variety=variety, seed=int(playlist_seed))
+                        st.session_state.generated_playlist = data["id"].take(rows).tolist()
+                    except Exception as e:
+                        st.error(f"Couldn't generate playlist: {e}")
+
+            generated = st.session_state.get("generated_playlist")
+            if generated:
+                rows = catalog.id_index.get_indexer(generated)
+                tracks = data.iloc[rows[rows >= 0]]
+                if len(tracks) < playlist_length:
+                    st.info(f"Only {len(tracks)} tracks fit this path; try a wider range or tolerance.")
+                fig = px.line(tracks.assign(position=np.arange(1, len(tracks) + 1)), x="position",
+                              y=["energy", "danceability", "valence"], title="Feature Path")
+                fig.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+                st.plotly_chart(fig, use_container_width=True)
+                st.dataframe(tracks[["name", "artists", "energy", "tempo"]].reset_index(drop=True),
+                             use_container_width=True)
+                if st.button("➕ Add All to Playlist", key="playlist_add_generated"):
+                    added = sum(st.session_state.playlist.add(song_id) for song_id in tracks["id"])
+                    st.success(f"Added {added} songs to your playlist!")
+
     st.subheader("🎶 Your Playlist")
     if st.session_state.playlist:
-        for i, song in enumerate(st.session_state.playlist):
+        playlist_songs = resolve_songs(list(st.session_state.playlist))
+        for song_id, song, artists in playlist_songs[["id", "Song", "Artists"]].itertuples(index=False):
             col1, col2 = st.columns([5, 1])
             with col1:
-                st.markdown(f"<div class='card'>🎵 {song}</div>", unsafe_allow_html=True)
+                st.markdown(f"<div class='card'>🎵 {song} <span style='color: #94A3B8;'>{artists}</span></div>",
+                            unsafe_allow_html=True)
             with col2:
-                if st.button("Remove", key=f"remove_playlist_{i}"):
-                    st.session_state.playlist.remove(song)
+                if st.button("Remove", key=f"remove_playlist_{song_id}"):
+                    st.session_state.playlist.remove(song_id)
                     st.rerun()
 
         if st.button("Export Playlist"):
             try:
-                pd.DataFrame(st.session_state.playlist, columns=["Song"]).to_csv("playlist.csv", index=False)
-                st.success("Playlist exported as playlist.csv!")
+                export_path = st.session_state.library.export_csv("playlist", resolve_songs)
+                st.success(f"Playlist exported as {export_path.relative_to(current_dir)}!")
                 st.download_button(
                     label="Download CSV",
-                    data=pd.DataFrame(st.session_state.playlist, columns=["Song"]).to_csv(index=False).encode('utf-8'),
+                    data=export_path.read_bytes(),
                     file_name="playlist.csv",
                     mime="text/csv",
                 )
@@ -629,3 +979,22 @@ elif "Playlist" in selected_tab:
                 st.error(f"Error exporting playlist: {e}")
     else:
         st.info("Your playlist is empty! Go to Search or Recommendations to add songs.")
+
+# Persist this rerun's library changes in one batch
+st.session_state.library.flush()
+
+# Reruns cut short by st.rerun() are not recorded
+rerun_ms = rerun_timing.stop()
+if rerun_sampler is not None:
+    rerun_sampler.stop(selected_tab)
+if os.environ.get("AMUSIC_METRICS_FILE"):
+    METRICS.dump(os.environ["AMUSIC_METRICS_FILE"])
+
+# Per-stage timings for this process, shown with ?debug=1 in the URL
+if st.query_params.get("debug"):
+    with st.sidebar.expander("🛠️ Performance", expanded=True):
+        snapshot = METRICS.snapshot()
+        st.caption(f"This rerun: {rerun_ms:,.0f} ms")
+        st.dataframe(pd.DataFrame.from_dict(snapshot["stages"], orient="index").round(2), use_container_width=True)
+        for name, stats in snapshot["caches"].items():
+            st.caption(f"⚡ {name} cache: {stats['hit_rate']:.0%} hit rate, {stats['entries']} entries")
@@ -0,0 +1,108 @@
+"""Precomputed summaries for the Home and Music Insights dashboards.
+
+Every Streamlit rerun used to group, average, correlate and bin the full
+catalog again. ``Analytics`` computes each summary once per dataset
+version and memoizes it by its arguments (feature set, bins) in a bounded
+LRU, so dashboard reruns only ever touch small arrays. Year trends come
+straight from the shipped ``data/data_by_year.csv`` when it holds the
+requested columns.
+
+Scatter plots are binned on the server as well: ``grid`` aggregates two
+features into a 2-D count grid and ``stratified_sample`` picks an opt-in
+subset of rows that keeps each grid cell's share of the catalog, so only
+aggregated arrays or a few thousand points are sent to the browser.
+"""
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Memoized summaries kept per kind before the least recently used is evicted
+MAX_ENTRIES = 64
+
+
+class Analytics:
+    """Dashboard summaries for one dataset version."""
+
+    def __init__(self, data, version, base_dir="."):
+        self.data = data
+        self.version = version
+        self.base_dir = Path(base_dir)
+        # Per-instance caches, so a new dataset version starts empty
+        self.yearly_trends = lru_cache(maxsize=MAX_ENTRIES)(self._yearly_trends)
+        self.feature_means = lru_cache(maxsize=MAX_ENTRIES)(self._feature_means)
+        self.correlation = lru_cache(maxsize=MAX_ENTRIES)(self._correlation)
+        self.histogram = lru_cache(maxsize=MAX_ENTRIES)(self._histogram)
+        self.top_values = lru_cache(maxsize=MAX_ENTRIES)(self._top_values)
+        self.grid = lru_cache(maxsize=MAX_ENTRIES)(self._grid)
+        self.stratified_sample = lru_cache(maxsize=MAX_ENTRIES)(self._stratified_sample)
+
+    def _aggregate(self, name, columns):
+        """A shipped aggregate table if it exists and has ``columns``, else ``None``."""
+        path = self.base_dir / "data" / name
+        if not path.exists():
+            return None
+        table = pd.read_csv(path, encoding="utf-8")
+        return table if set(columns) <= set(table.columns) else None
+
+    def _yearly_trends(self, metrics):
+        """Mean of each metric per year, as a small frame with a ``year`` column."""
+        metrics = list(metrics)
+        table = self._aggregate("data_by_year.csv", ["year"] + metrics)
+        if table is not None:
+            return table[["year"] + metrics].sort_values("year").reset_index(drop=True)
+        return self.data.groupby("year")[metrics].mean().reset_index()
+
+    def _feature_means(self, features):
+        return self.data[list(features)].mean()
+
+    def _correlation(self, features):
+        return self.data[list(features)].corr()
+
+    def _histogram(self, feature, bins=50, scale=1.0):
+        """Bin counts of ``feature * scale`` as a frame of bin ``center``, ``width`` and ``count``."""
+        values = self.data[feature].to_numpy(dtype=np.float64)
+        values = values[np.isfinite(values)] * scale
+        counts, edges = np.histogram(values, bins=bins)
+        return pd.DataFrame({"center": (edges[:-1] + edges[1:]) / 2, "width": np.diff(edges), "count": counts})
+
+    def _top_values(self, column, n=15):
+        return self.data[column].value_counts().nlargest(n)
+
+    def _finite_pairs(self, x, y):
+        values = self.data[[x, y]].to_numpy(dtype=np.float64)
+        return values[np.isfinite(values).all(axis=1)]
+
+    def _grid(self, x, y, bins=60):
+        """2-D counts of ``x`` against ``y`` as ``(x_centers, y_centers, counts)``.
+
+        ``counts`` is indexed ``[y_bin, x_bin]``, the orientation Plotly heatmaps expect.
+        """
+        values = self._finite_pairs(x, y)
+        counts, x_edges, y_edges = np.histogram2d(values[:, 0], values[:, 1], bins=bins)
+        return (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2, counts.T
+
+    def _stratified_sample(self, x, y, n=5000, bins=60, seed=0):
+        """``n`` rows of ``x``/``y`` drawn so every grid cell keeps its share of the catalog."""
+        values = self._finite_pairs(x, y)
+        if len(values) <= n:
+            return pd.DataFrame(values, columns=[x, y])
+        cells = []
+        for column in range(2):
+            edges = np.histogram_bin_edges(values[:, column], bins=bins)
+            cells.append(np.clip(np.searchsorted(edges, values[:, column], side="right") - 1, 0, bins - 1))
+        cell = cells[0] * bins + cells[1]
+
+        # Rank rows randomly within their cell and keep each cell's quota
+        order = np.lexsort((np.random.default_rng(seed).random(len(cell)), cell))
+        counts = np.bincount(cell, minlength=bins * bins)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        rank = np.arange(len(order)) - starts[cell[order]]
+        # Largest-remainder rounding so quotas add up to exactly n
+        share = counts * (n / len(values))
+        quota = np.floor(share)
+        remainder = share - quota
+        quota[np.argsort(-remainder, kind="stable")[:n - int(quota.sum())]] += 1
+        keep = order[rank < quota[cell[order]]]
+        return pd.DataFrame(values[np.sort(keep)], columns=[x, y])
@@ -0,0 +1,265 @@
+"""Approximate nearest-neighbour index: IVF cells with product-quantized residuals.
+
+Rows are unit-normalized like in ``recommender.RecommendationEngine``, so
+the inner product is the cosine similarity. A coarse k-means splits the
+catalog into cells; each row stores only its cell and a few one-byte PQ
+codes for the residual from the cell centroid. A query scores the
+``nprobe`` closest cells with a per-query lookup table (asymmetric
+distance computation) instead of scanning the whole catalog.
+
+The index records the fingerprint of the catalog it was built from;
+``IVFPQIndex.load`` raises ``StaleIndexError`` when given a catalog that
+no longer matches (e.g. after ``ingest.py`` updated tracks in place).
+
+Build offline from the repository root:
+
+    python ann_index.py --data data/data.csv --model data_model.pkl --out data_model_ivfpq.npz
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from model_bundle import dataset_fingerprint
+from preprocessing import FeatureScaler
+from recommender import normalize_rows, top_k_indices
+
+INDEX_VERSION = 1
+
+
+class StaleIndexError(ValueError):
+    """The index was built from another catalog."""
+
+
+def squared_distances(points, centroids):
+    """Squared euclidean distances between every point and every centroid."""
+    return (
+        np.einsum("ij,ij->i", points, points)[:, None]
+        - 2.0 * points @ centroids.T
+        + np.einsum("ij,ij->i", centroids, centroids)[None, :]
+    )
+
+
+def assign(points, centroids, block_size=65536):
+    """Index of the nearest centroid for each point, computed in bounded-memory blocks."""
+    labels = np.empty(len(points), dtype=np.int32)
+    for start in range(0, len(points), block_size):
+        block = points[start:start + block_size]
+        labels[start:start + block_size] = squared_distances(block, centroids).argmin(axis=1)
+    return labels
+
+
+def kmeans(points, n_clusters, n_iter=20, rng=None):
+    """Plain Lloyd's k-means; empty clusters are re-seeded from random points."""
+    rng = np.random.default_rng(rng)
+    n_clusters = min(n_clusters, len(points))
+    centroids = points[rng.choice(len(points), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = assign(points, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, points)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = points[rng.choice(len(points), empty.sum(), replace=False)]
+    return centroids
+
+
+class IVFPQIndex:
+    """Inverted-file index over unit vectors with product-quantized residuals."""
+
+    def __init__(self, centroids, codebooks, codes, order, offsets, feature_names, vectors=None, nprobe=8,
+                 fingerprint=None):
+        self.centroids = centroids          # (n_cells, dim)
+        self.codebooks = codebooks          # (n_subspaces, n_codes, dim // n_subspaces)
+        self.codes = codes                  # (n_rows, n_subspaces) uint8, sorted by cell
+        self.order = order                  # catalog row of each code, sorted by cell
+        self.offsets = offsets              # (n_cells + 1,) start of each cell in ``codes``
+        self.feature_names = list(feature_names)
+        self.vectors = vectors              # optional full vectors for exact refinement
+        self.nprobe = nprobe
+        self.fingerprint = fingerprint      # ``model_bundle.dataset_fingerprint`` of the indexed catalog
+        self.cells = np.repeat(np.arange(len(centroids), dtype=np.int32), np.diff(offsets))
+        self.position = np.empty_like(order)
+        self.position[order] = np.arange(len(order))
+
+    @classmethod
+    def build(cls, matrix, feature_names, n_cells=None, n_subspaces=4, n_codes=256,
+              train_size=100_000, keep_vectors=True, seed=0, fingerprint=None):
+        """Train the coarse quantizer and residual codebooks on a sample of ``matrix``."""
+        matrix = normalize_rows(matrix)
+        n_rows, dim = matrix.shape
+        if dim % n_subspaces:
+            raise ValueError(f"{dim} features cannot be split into {n_subspaces} subspaces")
+        n_cells = n_cells or max(1, int(np.sqrt(n_rows)))
+        rng = np.random.default_rng(seed)
+        sample = matrix[rng.choice(n_rows, min(train_size, n_rows), replace=False)]
+
+        centroids = kmeans(sample, n_cells, rng=rng)
+        residuals = sample - centroids[assign(sample, centroids)]
+        sub_dim = dim // n_subspaces
+        codebooks = np.stack([
+            kmeans(np.ascontiguousarray(residuals[:, m * sub_dim:(m + 1) * sub_dim]), n_codes, rng=rng)
+            for m in range(n_subspaces)
+        ])
+
+        labels = assign(matrix, centroids)
+        residuals = matrix - centroids[labels]
+        codes = np.stack([
+            assign(np.ascontiguousarray(residuals[:, m * sub_dim:(m + 1) * sub_dim]), codebooks[m])
+            for m in range(n_subspaces)
+        ], axis=1).astype(np.uint8)
+
+        order = np.argsort(labels, kind="stable")
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=len(centroids)), out=offsets[1:])
+        return cls(centroids.astype(np.float32), codebooks.astype(np.float32), codes[order],
+                   order, offsets, feature_names, matrix if keep_vectors else None, fingerprint=fingerprint)
+
+    @classmethod
+    def from_model(cls, data, model, **kwargs):
+        """Build over the same matrix the fitted ``NearestNeighbors`` searches.
+
+        Like ``RecommendationEngine.from_model``, a model that does not line
+        up with ``data`` row for row falls back to the catalog scaled the way
+        the notebook does it rather than raw units.
+        """
+        feature_names = list(model.feature_names_in_)
+        fitted = getattr(model, "_fit_X", None)
+        if fitted is None or len(fitted) != len(data):
+            fitted = FeatureScaler.fit(data, feature_names).transform(data)
+        return cls.build(fitted, feature_names, fingerprint=dataset_fingerprint(data, feature_names), **kwargs)
+
+    @classmethod
+    def from_bundle(cls, bundle, **kwargs):
+        """Build over a ``model_bundle.ModelBundle``'s normalized vectors."""
+        return cls.build(bundle.vectors, bundle.feature_names, fingerprint=bundle.manifest["dataset_sha256"], **kwargs)
+
+    def save(self, path):
+        arrays = dict(version=INDEX_VERSION, centroids=self.centroids, codebooks=self.codebooks,
+                      codes=self.codes, order=self.order, offsets=self.offsets,
+                      feature_names=np.array(self.feature_names))
+        if self.vectors is not None:
+            arrays["vectors"] = self.vectors
+        if self.fingerprint is not None:
+            arrays["dataset_sha256"] = np.array(self.fingerprint)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path, nprobe=8, data=None):
+        """Load a saved index; checked against catalog ``data`` when given."""
+        with np.load(path) as arrays:
+            if int(arrays["version"]) != INDEX_VERSION:
+                raise ValueError(f"Unsupported index version {int(arrays['version'])} in {path}")
+            fingerprint = str(arrays["dataset_sha256"]) if "dataset_sha256" in arrays.files else None
+            feature_names = arrays["feature_names"].tolist()
+            if data is not None and (fingerprint is None or len(data) != len(arrays["order"])
+                                     or dataset_fingerprint(data, feature_names) != fingerprint):
+                raise StaleIndexError(f"{path} was built from a different catalog; rebuild it with ann_index.py")
+            vectors = arrays["vectors"] if "vectors" in arrays.files else None
+            return cls(arrays["centroids"], arrays["codebooks"], arrays["codes"], arrays["order"],
+                       arrays["offsets"], feature_names, vectors, nprobe, fingerprint)
+
+    def __len__(self):
+        return len(self.order)
+
+    def vectors_for(self, rows):
+        """Unit feature vectors of catalog ``rows``, approximate without stored vectors."""
+        if self.vectors is not None:
+            return self.vectors[rows]
+        return self.reconstruct(rows)
+
+    def reconstruct(self, rows):
+        """Approximate vectors of catalog ``rows`` from their cells and PQ codes."""
+        positions = self.position[rows]
+        codes = self.codes[positions]
+        residual = self.codebooks[np.arange(len(self.codebooks)), codes]
+        return self.centroids[self.cells[positions]] + residual.reshape(codes.shape[:-1] + (-1,))
+
+    def search(self, vector, k, nprobe=None, refine=4):
+        """Top-k catalog rows for a unit ``vector`` as ``(indices, similarities)``.
+
+        When full vectors are kept, the best ``k * refine`` PQ candidates are
+        re-scored exactly before the final cut.
+        """
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        coarse = self.centroids @ vector
+        probe = top_k_indices(coarse, nprobe)
+        starts, stops = self.offsets[probe], self.offsets[probe + 1]
+        lengths = stops - starts
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+        n_subspaces, _, sub_dim = self.codebooks.shape
+        lookup = np.einsum("mcd,md->mc", self.codebooks, vector.reshape(n_subspaces, sub_dim))
+        scores = coarse[self.cells[positions]]
+        for m in range(n_subspaces):
+            scores = scores + lookup[m, self.codes[positions, m]]
+
+        if self.vectors is not None and refine:
+            shortlist = positions[top_k_indices(scores, k * refine)]
+            rows = self.order[shortlist]
+            exact = self.vectors[rows] @ vector
+            best = top_k_indices(exact, k)
+            return rows[best], exact[best]
+        best = top_k_indices(scores, k)
+        return self.order[positions[best]], scores[best]
+
+    def recommend(self, row, k):
+        """Drop-in for ``RecommendationEngine.recommend``."""
+        return self.search(self.vectors_for(row), k)
+
+    def seed_similarities(self, row, rows):
+        """Drop-in for ``RecommendationEngine.seed_similarities``."""
+        return self.vectors_for(rows) @ self.vectors_for(row)
+
+    def recommend_vectors(self, vectors, k, exclude=None):
+        """Drop-in for ``RecommendationEngine.recommend_vectors``, one probe per vector."""
+        exclude = np.empty(0, dtype=np.intp) if exclude is None else np.asarray(exclude, dtype=np.intp)
+        indices, scores = [], []
+        for vector in np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1):
+            found, similarity = self.search(vector, k + len(exclude))
+            indices.append(found)
+            scores.append(similarity)
+        indices, scores = np.concatenate(indices), np.concatenate(scores)
+        keep = ~np.isin(indices, exclude)
+        indices, scores = indices[keep], scores[keep]
+        # Best similarity per row when several vectors found it
+        order = np.argsort(-scores, kind="stable")
+        _, first = np.unique(indices[order], return_index=True)
+        best = order[first]
+        best = best[top_k_indices(scores[best], k)]
+        return indices[best], scores[best]
+
+
+def main():
+    import joblib
+
+    from catalog import load_catalog
+
+    parser = argparse.ArgumentParser(description="Build an IVF-PQ index for the song catalog.")
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--catalog", default=None, help="Columnar catalog copy (default: catalog/ next to --data)")
+    parser.add_argument("--model", default="data_model.pkl")
+    parser.add_argument("--bundle", default=None, help="Model bundle directory, used instead of --model")
+    parser.add_argument("--out", default="data_model_ivfpq.npz")
+    parser.add_argument("--cells", type=int, default=None, help="Coarse cells (default: sqrt of catalog size)")
+    parser.add_argument("--subspaces", type=int, default=4)
+    parser.add_argument("--no-vectors", action="store_true", help="Store PQ codes only, without exact refinement")
+    args = parser.parse_args()
+
+    # Loaded as the app loads it, so the fingerprint saved in the index matches the served catalog
+    data = load_catalog(args.data, args.catalog or Path(args.data).parent / "catalog")
+    options = dict(n_cells=args.cells, n_subspaces=args.subspaces, keep_vectors=not args.no_vectors)
+    if args.bundle:
+        from model_bundle import load_bundle
+
+        index = IVFPQIndex.from_bundle(load_bundle(args.bundle, data), **options)
+    else:
+        index = IVFPQIndex.from_model(data, joblib.load(args.model), **options)
+    index.save(args.out)
+    print(f"Indexed {len(index):,} songs into {len(index.centroids)} cells -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
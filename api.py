@@ -0,0 +1,407 @@
+"""Headless HTTP API over the same catalog, model bundle and indexes as the app.
+
+A plain ASGI application (no web framework needed), served for example with
+
+    uvicorn api:app --port 8000
+
+Endpoints, all ``GET`` and answering JSON:
+
+* ``/recommend?id=<song id>&top_n=10&diversity=0``, optionally filtered
+  with ``year=1990,1999``, ``tempo=100,130`` or ``popularity=50,100``
+* ``/search?q=<text>&limit=20``
+* ``/similar/<artist|genre|year>?key=<name>&top_n=5``
+* ``/health``
+* ``/metrics`` (Prometheus text, or ``?format=json``): per-endpoint
+  latency histograms and result cache hit rates
+
+Concurrent ``/recommend`` requests are gathered by ``MicroBatcher`` for up
+to ``BATCH_WINDOW`` seconds and answered together with matrix-matrix
+products and row-wise top-k over blocks of seeds (bounded by the engine's
+``BLOCK_BYTES``), instead of one matrix-vector product each.
+Filtered requests skip the batch and run ``filtered_recommendations``.
+Recommendation and search results are kept in a ``ResultCache``. Catalog
+revisions published by ``ingest.py`` are picked up without a restart. Set
+``AMUSIC_DIR`` to serve a checkout other than this file's directory and
+``AMUSIC_CACHE_DIR`` to keep cached results on disk.
+"""
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import joblib
+import numpy as np
+
+from entities import ENTITIES, EntityService
+from ingest import CHECK_INTERVAL, LiveCatalog
+from metrics import METRICS
+from model_bundle import dataset_fingerprint, load_bundle
+from preprocessing import FEATURES
+from recommender import (POOL_FACTOR, RecommendationEngine, diverse_recommendations, filtered_recommendations,
+                         mmr_rerank)
+from result_cache import ResultCache, cache_version, model_version
+
+# How long the first request of a batch waits for others to join, in seconds
+BATCH_WINDOW = 0.002
+# A batch is answered at once when it reaches this many requests
+MAX_BATCH = 256
+MAX_TOP_N = 100
+# Catalog columns returned for each song
+SONG_COLUMNS = ["id", "name", "artists", "year"]
+# Columns ``/recommend`` can be filtered on, as ``<column>=<low>,<high>``
+FILTER_PARAMS = ["year", "tempo", "popularity"]
+
+
+class BadRequest(ValueError):
+    """Invalid request parameters; answered with HTTP 400."""
+
+
+class MicroBatcher:
+    """Gathers concurrent recommendation requests into one batched top-k."""
+
+    def __init__(self, engine, window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self.engine = engine
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.requests = 0
+
+    async def recommend(self, row, top_n, diversity=0.0):
+        """``(indices, similarities)`` for catalog ``row``, computed with whatever else is pending."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, top_n, diversity, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self.batches += 1
+            self.requests += len(batch)
+            task = asyncio.get_running_loop().run_in_executor(None, self._answer, batch)
+            task.add_done_callback(lambda done: self._fail(batch, done.exception()))
+
+    def _answer(self, batch):
+        rows = np.array([row for row, _, _, _ in batch], dtype=np.intp)
+        pool = max(top_n * POOL_FACTOR if diversity > 0 else top_n for _, top_n, diversity, _ in batch)
+        results = []
+        # The engine's own blocking keeps each similarity block under ``BLOCK_BYTES``
+        for _, indices, scores in self.engine.recommend_rows(rows, pool):
+            for (_, top_n, diversity, _), found, similarity in zip(batch[len(results):], indices, scores):
+                if diversity > 0:
+                    found, similarity = found[:top_n * POOL_FACTOR], similarity[:top_n * POOL_FACTOR]
+                    vectors = self.engine.vectors_for(found)
+                    picks = mmr_rerank(similarity, vectors @ vectors.T, top_n, diversity)
+                    results.append((found[picks], similarity[picks]))
+                else:
+                    results.append((found[:top_n], similarity[:top_n]))
+        for (_, _, _, future), result in zip(batch, results):
+            future.get_loop().call_soon_threadsafe(_resolve, future, result)
+
+    def _fail(self, batch, error):
+        if error is None:
+            return
+        for _, _, _, future in batch:
+            future.get_loop().call_soon_threadsafe(_reject, future, error)
+
+
+def _resolve(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _reject(future, error):
+    if not future.done():
+        future.set_exception(error)
+
+
+class RecommendationService:
+    """Catalog, engine and indexes shared by every request."""
+
+    def __init__(self, snapshot, engine, base_dir, cache=None):
+        self.snapshot = snapshot
+        self.data = snapshot.data
+        self.engine = engine
+        self.cache = cache if cache is not None else ResultCache("uncached", max_entries=0)
+        self.batcher = MicroBatcher(engine)
+        self.search_index = snapshot.search_index
+        self.entities = EntityService(base_dir)
+        # Plain arrays of the returned columns; slicing them is much cheaper than a frame per request
+        self.columns = {column: self.data[column].to_numpy() for column in SONG_COLUMNS if column in self.data.columns}
+
+    @classmethod
+    def load(cls, base_dir, snapshot):
+        """Load the model for a catalog snapshot the way ``Music.py`` does."""
+        base_dir = Path(base_dir)
+        data = snapshot.data
+        bundle_path = base_dir / "data_model"
+        if (bundle_path / "manifest.json").exists():
+            model = load_bundle(bundle_path, data)
+            engine = RecommendationEngine.from_bundle(model, data)
+        else:
+            model = joblib.load(base_dir / "data_model.pkl")
+            engine = RecommendationEngine.from_model(data, model)
+        # Same version as the app's cache, so both can share AMUSIC_CACHE_DIR
+        version = cache_version(
+            dataset_fingerprint(data, [c for c in FEATURES if c in data.columns]),
+            model_version(model, base_dir / "data_model.pkl"),
+            "exact",
+        )
+        cache = ResultCache(version, disk_dir=os.environ.get("AMUSIC_CACHE_DIR"))
+        return cls(snapshot, engine, base_dir, cache)
+
+    def songs(self, rows, scores=None):
+        values = {column: array[rows].tolist() for column, array in self.columns.items()}
+        if scores is not None:
+            values["similarity"] = np.asarray(scores, dtype=np.float64).tolist()
+        return [dict(zip(values, record)) for record in zip(*values.values())]
+
+    async def recommend(self, params):
+        song_id = _param(params, "id")
+        top_n = _int_param(params, "top_n", 10, 1, MAX_TOP_N)
+        diversity = _float_param(params, "diversity", 0.0, 0.0, 1.0)
+        try:
+            row = int(self.engine.rows_for([song_id])[0])
+        except KeyError as e:
+            raise LookupError(str(e.args[0])) from None
+        ranges = {column: _range_param(params, column) for column in FILTER_PARAMS if column in params}
+        key = ("api-recommend", row, top_n, diversity, tuple(sorted(ranges.items())))
+        result = self.cache.get(key)
+        if result is None:
+            if ranges:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    None, self.recommend_filtered, row, top_n, diversity, ranges)
+            else:
+                result = await self.batcher.recommend(row, top_n, diversity)
+            self.cache.put(key, result)
+        indices, scores = result
+        return {"id": song_id, "recommendations": self.songs(indices, scores)}
+
+    def recommend_filtered(self, row, top_n, diversity, ranges):
+        column_index = self.snapshot.column_index
+        if diversity > 0:
+            return diverse_recommendations(self.engine, row, top_n, diversity,
+                                           column_index=column_index, ranges=ranges)
+        return filtered_recommendations(self.engine, row, top_n, column_index, ranges)
+
+    async def search(self, params):
+        query = _param(params, "q")
+        limit = _int_param(params, "limit", 20, 1, MAX_TOP_N)
+        key = ("api-search", query, limit)
+        rows = self.cache.get(key)
+        if rows is None:
+            rows = await asyncio.get_running_loop().run_in_executor(None, self.search_index.search, query, limit)
+            self.cache.put(key, rows)
+        return {"query": query, "results": self.songs(rows)}
+
+    async def similar(self, entity, params):
+        if entity not in self.entities.available():
+            raise LookupError(f"Unknown or unavailable entity type: {entity}")
+        key = _param(params, "key")
+        if entity == "year":
+            key = _int_param(params, "key", None, 0, 9999)
+        top_n = _int_param(params, "top_n", 5, 1, MAX_TOP_N)
+        loop = asyncio.get_running_loop()
+        try:
+            table = await loop.run_in_executor(None, self.entities.similar, entity, key, top_n)
+        except KeyError as e:
+            raise LookupError(str(e.args[0])) from None
+        column = ENTITIES[entity][1]
+        results = [{"key": _plain(k), "similarity": float(s)} for k, s in zip(table[column], table["similarity"])]
+        return {"entity": entity, "key": key, "results": results}
+
+    def health(self):
+        return {
+            "status": "ok",
+            "revision": self.snapshot.revision,
+            "catalog_size": len(self.data),
+            "batches": self.batcher.batches,
+            "batched_requests": self.batcher.requests,
+            "cache": self.cache.stats(),
+        }
+
+
+def _param(params, name):
+    values = params.get(name)
+    if not values or not values[0]:
+        raise BadRequest(f"Missing parameter: {name}")
+    return values[0]
+
+
+def _int_param(params, name, default, low, high):
+    if name not in params:
+        if default is None:
+            raise BadRequest(f"Missing parameter: {name}")
+        return default
+    try:
+        value = int(params[name][0])
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer") from None
+    if not low <= value <= high:
+        raise BadRequest(f"{name} must be between {low} and {high}")
+    return value
+
+
+def _float_param(params, name, default, low, high):
+    if name not in params:
+        return default
+    try:
+        value = float(params[name][0])
+    except ValueError:
+        raise BadRequest(f"{name} must be a number") from None
+    if not low <= value <= high:
+        raise BadRequest(f"{name} must be between {low} and {high}")
+    return value
+
+
+def _range_param(params, name):
+    low, _, high = params[name][0].partition(",")
+    try:
+        low, high = float(low), float(high)
+    except ValueError:
+        raise BadRequest(f"{name} must be two numbers: <low>,<high>") from None
+    if low > high:
+        raise BadRequest(f"{name} must not start above where it ends")
+    return low, high
+
+
+def _plain(value):
+    """JSON-safe version of a numpy scalar."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+async def _send_text(send, status, text):
+    payload = text.encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"text/plain; version=0.0.4"), (b"content-length", str(len(payload)).encode())],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def _send_json(send, status, body):
+    payload = json.dumps(body, default=_plain).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+class App:
+    """ASGI entry point; loads the service on startup (or on the first request).
+
+    Every ``CHECK_INTERVAL`` seconds a worker thread looks for a catalog
+    revision published by ``ingest.py``. The next service is built there
+    while requests keep using the current one, then swapped in.
+    """
+
+    def __init__(self, base_dir=None):
+        self.base_dir = Path(base_dir or os.environ.get("AMUSIC_DIR", Path(__file__).parent))
+        self.service = None
+        self.live = None
+        self._loading = None
+        self._refreshing = None
+        self._checked = 0.0
+        METRICS.watch_cache("api_results", lambda: self.service.cache.stats() if self.service else None)
+
+    def _load(self):
+        self.live = LiveCatalog(self.base_dir, check_interval=0)
+        return RecommendationService.load(self.base_dir, self.live.current())
+
+    async def startup(self):
+        if self._loading is None:
+            loop = asyncio.get_running_loop()
+            self._loading = loop.run_in_executor(None, self._load)
+        self.service = self.service or await self._loading
+        self._checked = self._checked or time.monotonic()
+
+    def _next_service(self):
+        snapshot = self.live.current()
+        if snapshot is self.service.snapshot:
+            return self.service
+        return RecommendationService.load(self.base_dir, snapshot)
+
+    def _swap(self, future):
+        self._refreshing = None
+        if future.exception() is None:
+            self.service = future.result()
+
+    def refresh(self):
+        """Start looking for a new catalog revision if the last check is old enough."""
+        now = time.monotonic()
+        if self._refreshing is None and now - self._checked >= CHECK_INTERVAL:
+            self._checked = now
+            self._refreshing = asyncio.get_running_loop().run_in_executor(None, self._next_service)
+            self._refreshing.add_done_callback(self._swap)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    try:
+                        await self.startup()
+                    except Exception as e:
+                        await send({"type": "lifespan.startup.failed", "message": str(e)})
+                        return
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+        if scope["method"] != "GET":
+            await _send_json(send, 405, {"error": "Only GET is supported"})
+            return
+
+        await self.startup()
+        self.refresh()
+        service = self.service
+        path = scope["path"].rstrip("/")
+        params = parse_qs(scope.get("query_string", b"").decode("utf-8"))
+        if path == "/metrics":
+            if params.get("format", ["text"])[0] == "json":
+                await _send_json(send, 200, METRICS.snapshot())
+            else:
+                await _send_text(send, 200, METRICS.prometheus())
+            return
+        try:
+            if path == "/recommend":
+                with METRICS.stage("api_recommend"):
+                    body = await service.recommend(params)
+            elif path == "/search":
+                with METRICS.stage("api_search"):
+                    body = await service.search(params)
+            elif path.startswith("/similar/"):
+                with METRICS.stage("api_similar"):
+                    body = await service.similar(path[len("/similar/"):], params)
+            elif path == "/health":
+                body = service.health()
+            else:
+                await _send_json(send, 404, {"error": f"No such endpoint: {scope['path']}"})
+                return
+        except BadRequest as e:
+            await _send_json(send, 400, {"error": str(e)})
+        except LookupError as e:
+            await _send_json(send, 404, {"error": str(e)})
+        except Exception as e:
+            await _send_json(send, 500, {"error": f"Internal error: {e}"})
+        else:
+            await _send_json(send, 200, body)
+
+
+app = App()
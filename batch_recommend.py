@@ -0,0 +1,94 @@
+"""Precompute "similar tracks" for the whole catalog (or a list of seeds).
+
+Seeds are scored block by block with ``RecommendationEngine.recommend_batch``
+and each block is appended to the output as soon as it is ready, so memory
+stays bounded no matter how many seeds are requested.
+
+    python batch_recommend.py --out similar_tracks.parquet --top-n 20
+"""
+import argparse
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from model_bundle import load_bundle
+from recommender import RecommendationEngine
+
+
+def block_frame(seed_ids, song_ids, scores):
+    """Long-format rows (seed_id, rank, id, similarity) for one block of seeds."""
+    top_n = song_ids.shape[1]
+    return pd.DataFrame({
+        "seed_id": np.repeat(seed_ids, top_n),
+        "rank": np.tile(np.arange(1, top_n + 1, dtype=np.int16), len(seed_ids)),
+        "id": song_ids.ravel(),
+        "similarity": scores.ravel().astype(np.float32),
+    })
+
+
+def write_recommendations(batches, path):
+    """Stream ``recommend_batch`` output to a Parquet or CSV file; returns the row count."""
+    path = Path(path)
+    written = 0
+    if path.suffix == ".parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for batch in batches:
+                table = pa.Table.from_pandas(block_frame(*batch), preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                written += table.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        with open(path, "w", encoding="utf-8", newline="") as handle:
+            for i, batch in enumerate(batches):
+                frame = block_frame(*batch)
+                frame.to_csv(handle, header=i == 0, index=False)
+                written += len(frame)
+    return written
+
+
+def load_engine(data, bundle_path, model_path):
+    """Engine over the bundle when present (as served), else over the notebook's pickle."""
+    if bundle_path and (Path(bundle_path) / "manifest.json").exists():
+        return RecommendationEngine.from_bundle(load_bundle(bundle_path, data), data)
+    return RecommendationEngine.from_model(data, joblib.load(model_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute similar tracks for every seed song.")
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--bundle", default="data_model", help="Model bundle (used when it exists)")
+    parser.add_argument("--model", default="data_model.pkl")
+    parser.add_argument("--out", default="similar_tracks.parquet", help=".parquet or .csv")
+    parser.add_argument("--seeds", default=None, help="Optional file with one song id per line")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--diversity", type=float, default=0.0)
+    parser.add_argument("--block-size", type=int, default=None)
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data, encoding="utf-8")
+    engine = load_engine(data, args.bundle, args.model)
+    if args.seeds:
+        song_ids = Path(args.seeds).read_text(encoding="utf-8").split()
+    else:
+        song_ids = engine.ids
+
+    start = time.perf_counter()
+    batches = engine.recommend_batch(song_ids, args.top_n, args.diversity, args.block_size)
+    written = write_recommendations(batches, args.out)
+    print(f"Wrote {written:,} rows for {len(song_ids):,} seeds to {args.out} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Recall@k versus latency of the IVF-PQ index against the exact engine.
+
+Run from the repository root:
+
+    python -m benchmarks.ann --data data/data.csv --model data_model.pkl --nprobe 1 2 4 8 16 32
+"""
+import argparse
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from ann_index import IVFPQIndex
+from recommender import RecommendationEngine
+
+
+def run(engine, index, nprobes, queries=500, top_n=10, refine=4, seed=0):
+    rows = np.random.default_rng(seed).choice(len(engine), size=min(queries, len(engine)), replace=False)
+
+    start = time.perf_counter()
+    exact = [engine.recommend(row, top_n)[0] for row in rows]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(rows)
+
+    report = [{"nprobe": "exact", "recall": 1.0, "latency_ms": exact_ms}]
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        approx = [index.search(engine.matrix[row], top_n, nprobe=nprobe, refine=refine)[0] for row in rows]
+        latency_ms = (time.perf_counter() - start) * 1000 / len(rows)
+        recall = np.mean([len(np.intersect1d(a, e)) / top_n for a, e in zip(approx, exact)])
+        report.append({"nprobe": nprobe, "recall": float(recall), "latency_ms": latency_ms})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--model", default="data_model.pkl")
+    parser.add_argument("--index", default=None, help="Prebuilt .npz index (built on the fly if omitted)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--refine", type=int, default=4, help="Exact re-ranking factor, 0 for PQ scores only")
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data, encoding="utf-8")
+    model = joblib.load(args.model)
+    engine = RecommendationEngine.from_model(data, model)
+    if args.index:
+        index = IVFPQIndex.load(args.index)
+    else:
+        start = time.perf_counter()
+        index = IVFPQIndex.from_model(data, model)
+        print(f"Built {len(index.centroids)} cells in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'nprobe':>8} {'recall@' + str(args.top_n):>10} {'ms/query':>10}")
+    for row in run(engine, index, args.nprobe, args.queries, args.top_n, args.refine):
+        print(f"{row['nprobe']:>8} {row['recall']:>10.3f} {row['latency_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
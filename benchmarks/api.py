@@ -0,0 +1,89 @@
+"""Latency percentiles and throughput of a running ``api.py`` server.
+
+Start the server, then run the load test from the repository root:
+
+    uvicorn api:app --port 8000
+    python -m benchmarks.api --url http://127.0.0.1:8000 --concurrency 64 --requests 5000
+
+Each client keeps one HTTP/1.1 connection open and sends ``/recommend``
+requests for random catalog ids back to back, so concurrent requests reach
+the server's micro-batcher together.
+"""
+import argparse
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+
+async def fetch(reader, writer, host, path):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("ascii"))
+    await writer.drain()
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+
+async def client(host, port, paths, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for path in paths:
+            start = time.perf_counter()
+            statuses.append(await fetch(reader, writer, host, path))
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def load_test(url, song_ids, concurrency=64, requests=5000, top_n=10, seed=0):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    picks = np.random.default_rng(seed).choice(song_ids, size=requests)
+    paths = [f"/recommend?id={song_id}&top_n={top_n}" for song_id in picks]
+    latencies, statuses = [], []
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, paths[i::concurrency], latencies, statuses) for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1e3
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(status != 200 for status in statuses),
+        "throughput_rps": requests / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--data", default="data/data.csv", help="Catalog to draw song ids from")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--top-n", type=int, default=10)
+    args = parser.parse_args()
+
+    song_ids = pd.read_csv(args.data, usecols=["id"], dtype=str, encoding="utf-8")["id"].to_numpy()
+    results = asyncio.run(load_test(args.url, song_ids, args.concurrency, args.requests, args.top_n))
+    for key, value in results.items():
+        print(f"{key:>18}: {value:,.3f}" if isinstance(value, float) else f"{key:>18}: {value:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Cold-load time of the catalog: ``pd.read_csv`` versus the memory-mapped columns.
+
+Run from the repository root after ``python catalog.py``:
+
+    python -m benchmarks.catalog --data data/data.csv --catalog data/catalog
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from catalog import load_catalog, read_columns, read_manifest
+
+
+def run(csv_path, out_dir, repeats=3):
+    manifest = read_manifest(out_dir)
+    if manifest is None:
+        raise SystemExit(f"No catalog in {out_dir}; run 'python catalog.py' first")
+
+    def best_of(load):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            load()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    return {
+        "rows": manifest["rows"],
+        "read_csv_seconds": best_of(lambda: pd.read_csv(csv_path, encoding="utf-8")),
+        "mmap_seconds": best_of(lambda: read_columns(out_dir, manifest)),
+        "load_catalog_seconds": best_of(lambda: load_catalog(csv_path, out_dir)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--catalog", default="data/catalog")
+    args = parser.parse_args()
+
+    for key, value in run(args.data, args.catalog).items():
+        print(f"{key:>20}: {value:,.3f}" if isinstance(value, float) else f"{key:>20}: {value:,}")
+
+
+if __name__ == "__main__":
+    main()
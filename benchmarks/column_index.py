@@ -0,0 +1,67 @@
+"""Advanced Search filter latency: boolean masks versus ``ColumnIndex`` slices.
+
+Run from the repository root:
+
+    python -m benchmarks.column_index --data data/data.csv
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from column_index import PAGE_SIZE, ColumnIndex, page
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def run(data, repeat=50, seed=0):
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    index = ColumnIndex(data, ["year", "tempo"])
+    build_seconds = time.perf_counter() - start
+
+    years = data["year"].to_numpy()
+    low_year = int(rng.integers(years.min(), years.max() - 10))
+    year_range, bpm_range = (low_year, low_year + 10), (80, 120)
+
+    # The old tab: filter full-length masks, then render the first page
+    def masks():
+        results = data[data["year"].between(*year_range)]
+        results = results[results["tempo"].between(*bpm_range)]
+        return results.head(PAGE_SIZE)
+
+    def sorted_slices():
+        rows = index.filter({"year": year_range, "tempo": bpm_range})
+        return data.iloc[page(rows)[0]]
+
+    mask_seconds, expected = timed(masks, repeat)
+    index_seconds, actual = timed(sorted_slices, repeat)
+    return {
+        "catalog_size": len(data),
+        "index_build_ms": build_seconds * 1e3,
+        "mask_ms": mask_seconds * 1e3,
+        "index_ms": index_seconds * 1e3,
+        "speedup": mask_seconds / index_seconds,
+        "first_page_overlap": float(np.mean(expected.index.to_numpy() == actual.index.to_numpy())),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data, encoding="utf-8")
+    for key, value in run(data, args.repeat).items():
+        print(f"{key:>18}: {value:,.3f}" if isinstance(value, float) else f"{key:>18}: {value:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Latency of MMR diversity re-ranking for a range of candidate pool sizes.
+
+Run from the repository root:
+
+    python -m benchmarks.diversity --pool 100 200 300 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+from recommender import mmr_rerank, normalize_rows
+
+
+def run(pool_sizes, top_n=20, diversity=0.7, repeats=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    report = []
+    for pool in pool_sizes:
+        vectors = normalize_rows(rng.random((pool, 8)))
+        relevance = vectors @ normalize_rows(rng.random((1, 8)))[0]
+        pairwise = vectors @ vectors.T
+        start = time.perf_counter()
+        for _ in range(repeats):
+            mmr_rerank(relevance, pairwise, top_n, diversity)
+        report.append({"pool": pool, "latency_ms": (time.perf_counter() - start) * 1000 / repeats})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pool", type=int, nargs="+", default=[50, 100, 200, 300, 500])
+    parser.add_argument("--top-n", type=int, default=20)
+    parser.add_argument("--diversity", type=float, default=0.7)
+    args = parser.parse_args()
+
+    print(f"{'pool':>6} {'ms/re-rank':>11}")
+    for row in run(args.pool, args.top_n, args.diversity):
+        print(f"{row['pool']:>6} {row['latency_ms']:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
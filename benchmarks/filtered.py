@@ -0,0 +1,87 @@
+"""Filtered recommendations: over-fetch post-filtering, pre-filtering and the adaptive choice.
+
+Run from the repository root:
+
+    python -m benchmarks.filtered --data data/data.csv --model data_model.pkl
+
+For filters of increasing selectivity this prints how often fetching
+``top_n * 2`` neighbours and filtering them comes back short, and the
+latency of always pre-filtering versus ``filtered_recommendations``.
+"""
+import argparse
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from column_index import ColumnIndex
+from recommender import RecommendationEngine, filtered_recommendations, top_k_indices
+
+FILTERS = {
+    "one year": {"year": (2000, 2000)},
+    "decade, 100-130 bpm": {"year": (1990, 1999), "tempo": (100.0, 130.0)},
+    "decade": {"year": (1990, 1999)},
+    "popularity >= 50": {"popularity": (50, 100)},
+    "since 1950": {"year": (1950, 2100)},
+}
+
+
+def prefiltered(engine, column_index, row, top_n, ranges):
+    allowed = column_index.filter(ranges)
+    allowed = allowed[allowed != row]
+    scores = engine.vectors_for(allowed) @ engine.vectors_for(row)
+    return allowed[top_k_indices(scores, top_n)]
+
+
+def timed(function, rows):
+    start = time.perf_counter()
+    results = [function(row) for row in rows]
+    return results, (time.perf_counter() - start) * 1000 / len(rows)
+
+
+def run(data, engine, queries=200, top_n=10, seed=0):
+    column_index = ColumnIndex(data, ["year", "tempo", "popularity"])
+    rows = np.random.default_rng(seed).choice(len(engine), size=min(queries, len(engine)), replace=False)
+
+    def naive(row):
+        indices, _ = engine.recommend(row, top_n * 2 + 1)
+        return indices[column_index.matches(ranges, indices) & (indices != row)][:top_n]
+
+    report = []
+    for name, ranges in FILTERS.items():
+        expected, prefilter_ms = timed(lambda row: prefiltered(engine, column_index, row, top_n, ranges), rows)
+        short, naive_ms = timed(naive, rows)
+        actual, adaptive_ms = timed(
+            lambda row: filtered_recommendations(engine, row, top_n, column_index, ranges)[0], rows)
+        report.append({
+            "filter": name,
+            "selectivity": column_index.selectivity(ranges),
+            "naive_full": float(np.mean([len(found) == top_n for found in short])),
+            "naive_ms": naive_ms,
+            "prefilter_ms": prefilter_ms,
+            "adaptive_ms": adaptive_ms,
+            "adaptive_exact": float(np.mean([np.array_equal(a, e) for a, e in zip(actual, expected)])),
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--model", default="data_model.pkl")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-n", type=int, default=10)
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data, encoding="utf-8")
+    engine = RecommendationEngine.from_model(data, joblib.load(args.model))
+    print(f"{'filter':>20} {'kept':>6} {'naive full':>10} {'naive ms':>9} {'prefilter ms':>12} "
+          f"{'adaptive ms':>11} {'exact':>6}")
+    for row in run(data, engine, args.queries, args.top_n):
+        print(f"{row['filter']:>20} {row['selectivity']:>6.1%} {row['naive_full']:>10.1%} {row['naive_ms']:>9.3f} "
+              f"{row['prefilter_ms']:>12.3f} {row['adaptive_ms']:>11.3f} {row['adaptive_exact']:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
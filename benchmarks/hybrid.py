@@ -0,0 +1,73 @@
+"""Hybrid audio-plus-genre recommendations versus audio only: latency and genre overlap.
+
+Run from the repository root with either genre source:
+
+    python -m benchmarks.hybrid --data data/data.csv --model data_model.pkl --artist-genres data/data_w_genres.csv
+    python -m benchmarks.hybrid --data data/data.csv --model data_model.pkl --genre-profiles data/data_by_genres.csv
+"""
+import argparse
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from genre_vectors import GenreVectors, HybridEngine
+from recommender import RecommendationEngine
+
+
+def timed(engine, rows, top_n):
+    start = time.perf_counter()
+    results = [engine.recommend(row, top_n + 1)[0] for row in rows]
+    return results, (time.perf_counter() - start) * 1000 / len(rows)
+
+
+def run(engine, genres, weight=0.3, queries=300, top_n=10, seed=0):
+    hybrid = HybridEngine(engine, genres, weight)
+    rows = np.random.default_rng(seed).choice(len(engine), size=min(queries, len(engine)), replace=False)
+    timed(hybrid, rows[:10], top_n)  # Warm up both paths
+    audio, audio_ms = timed(engine, rows, top_n)
+    blended, hybrid_ms = timed(hybrid, rows, top_n)
+
+    def overlap(results):
+        # Mean genre cosine between each seed and its recommendations
+        return float(np.mean([genres.similarities(row, found[found != row]).mean()
+                              for row, found in zip(rows, results)]))
+
+    return {
+        "catalog_size": len(engine),
+        "genres": genres.matrix.shape[1],
+        "weight": weight,
+        "audio_ms": audio_ms,
+        "hybrid_ms": hybrid_ms,
+        "latency_ratio": hybrid_ms / audio_ms,
+        "audio_genre_cos": overlap(audio),
+        "hybrid_genre_cos": overlap(blended),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--model", default="data_model.pkl")
+    parser.add_argument("--artist-genres", default=None, help="data_w_genres.csv (genres per artist)")
+    parser.add_argument("--genre-profiles", default="data/data_by_genres.csv")
+    parser.add_argument("--weight", type=float, default=0.3)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-n", type=int, default=10)
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data, encoding="utf-8")
+    engine = RecommendationEngine.from_model(data, joblib.load(args.model))
+    start = time.perf_counter()
+    if args.artist_genres:
+        genres = GenreVectors.from_artists(data, pd.read_csv(args.artist_genres, encoding="utf-8"))
+    else:
+        genres = GenreVectors.from_profiles(engine, pd.read_csv(args.genre_profiles, encoding="utf-8"))
+    print(f"Built {genres.source} genre vectors in {time.perf_counter() - start:.1f}s")
+    for key, value in run(engine, genres, args.weight, args.queries, args.top_n).items():
+        print(f"{key:>18}: {value:,.3f}" if isinstance(value, float) else f"{key:>18}: {value:,}")
+
+
+if __name__ == "__main__":
+    main()
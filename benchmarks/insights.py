@@ -0,0 +1,61 @@
+"""Payload size and render time of the Music Insights charts, raw rows versus server-side binning.
+
+Run from the repository root:
+
+    python -m benchmarks.insights --data data/data.csv --x energy --y tempo
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from analytics import Analytics
+
+
+def render(build):
+    """Seconds to build and serialize a figure, and the JSON payload in MB."""
+    start = time.perf_counter()
+    payload = build().to_json()
+    return time.perf_counter() - start, len(payload) / 2**20
+
+
+def heatmap(analytics, x, y):
+    x_centers, y_centers, counts = analytics.grid(x, y, 60)
+    return go.Figure(go.Heatmap(x=x_centers, y=y_centers, z=np.where(counts > 0, counts, np.nan)))
+
+
+def run(data, x, y):
+    analytics = Analytics(data, "benchmark")
+    charts = {
+        "scatter_raw": lambda: px.scatter(data, x=x, y=y),
+        "scatter_grid": lambda: heatmap(analytics, x, y),
+        "scatter_sample": lambda: px.scatter(analytics.stratified_sample(x, y, 5000), x=x, y=y),
+        "histogram_raw": lambda: px.histogram(data, x=x, nbins=50),
+        "histogram_binned": lambda: px.bar(analytics.histogram(x, 50), x="center", y="count"),
+    }
+    report = []
+    for name, build in charts.items():
+        cold_seconds, megabytes = render(build)
+        warm_seconds, _ = render(build)  # Second render hits the memoized summaries
+        report.append({"chart": name, "cold_s": cold_seconds, "warm_s": warm_seconds, "payload_mb": megabytes})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--x", default="energy")
+    parser.add_argument("--y", default="tempo")
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data, encoding="utf-8")
+    print(f"{'chart':>17} {'cold s':>8} {'warm s':>8} {'payload MB':>11}")
+    for row in run(data, args.x, args.y):
+        print(f"{row['chart']:>17} {row['cold_s']:>8.3f} {row['warm_s']:>8.3f} {row['payload_mb']:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
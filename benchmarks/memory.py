@@ -0,0 +1,122 @@
+"""Catalog memory: the CSV as parsed by pandas versus the compact columnar catalog.
+
+Run from the repository root, on the real catalog or a synthetic one of
+the same size:
+
+    python -m benchmarks.memory --data data/data.csv
+    python -m benchmarks.memory --size 170k
+
+Memory is ``DataFrame.memory_usage(deep=True)`` per column. Memory-mapped
+columns of the compact catalog are counted too, although processes on
+one host share their pages. The last lines time rendering a page of
+results with ``iterrows`` versus ``track_records``.
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_catalog, rows_for
+from catalog import compact, convert, load_catalog, track_records
+
+PAGE = 20
+
+
+def mapped(values):
+    """Whether ``values`` is backed by a memory-mapped file."""
+    while values is not None:
+        if isinstance(values, np.memmap):
+            return True
+        values = getattr(values, "base", None)
+    return False
+
+
+def render_iterrows(data, rows):
+    return [(row["id"], row["name"], row["artists"], row["tempo"]) for _, row in data.iloc[rows].iterrows()]
+
+
+def render_records(data, rows):
+    return [(track.id, track.name, track.artists, track.tempo) for track in track_records(data, rows)]
+
+
+def timed(function, repeat=50):
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    milliseconds = (time.perf_counter() - start) * 1000 / repeat
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return milliseconds, peak / 1024
+
+
+def run(csv_path, seed=0):
+    with tempfile.TemporaryDirectory(prefix="amusic-memory-") as scratch:
+        convert(csv_path, Path(scratch) / "catalog")
+        before = pd.read_csv(csv_path, encoding="utf-8")
+        after = load_catalog(csv_path, Path(scratch) / "catalog")
+        from_csv = compact(before)
+
+        columns = []
+        before_usage = before.memory_usage(deep=True, index=False)
+        after_usage = after.memory_usage(deep=True, index=False)
+        for column in before.columns:
+            columns.append({
+                "column": column,
+                "before_dtype": str(before[column].dtype),
+                "after_dtype": str(after[column].dtype),
+                "before_mb": before_usage[column] / 2**20,
+                "after_mb": after_usage[column] / 2**20,
+                "mapped": mapped(after[column].to_numpy()) if isinstance(after[column].dtype, np.dtype) else False,
+            })
+
+        rows = np.random.default_rng(seed).choice(len(after), size=min(PAGE, len(after)), replace=False)
+        iterrows_ms, iterrows_kb = timed(lambda: render_iterrows(after, rows))
+        records_ms, records_kb = timed(lambda: render_records(after, rows))
+        summary = {
+            "rows": len(before),
+            "before_mb": before_usage.sum() / 2**20,
+            "after_mb": after_usage.sum() / 2**20,
+            "mapped_mb": sum(column["after_mb"] for column in columns if column["mapped"]),
+            "compact_csv_mb": from_csv.memory_usage(deep=True, index=False).sum() / 2**20,
+            "iterrows_ms": iterrows_ms,
+            "iterrows_kb": iterrows_kb,
+            "records_ms": records_ms,
+            "records_kb": records_kb,
+        }
+        summary["reduction"] = 1 - summary["after_mb"] / summary["before_mb"]
+    return columns, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default=None, help="Catalog CSV (default: a synthetic one of --size)")
+    parser.add_argument("--size", default="170k")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="amusic-memory-") as scratch:
+        csv_path = args.data
+        if csv_path is None:
+            csv_path = Path(scratch) / "data.csv"
+            make_catalog(rows_for(args.size)).to_csv(csv_path, index=False, encoding="utf-8")
+        columns, summary = run(csv_path)
+
+    print(f"{'column':>18} {'before':>16} {'after':>16} {'before MB':>10} {'after MB':>9}")
+    for column in columns:
+        after_dtype = column["after_dtype"] + (" (mmap)" if column["mapped"] else "")
+        print(f"{column['column']:>18} {column['before_dtype']:>16} {after_dtype:>16} "
+              f"{column['before_mb']:>10.2f} {column['after_mb']:>9.2f}")
+    for key, value in summary.items():
+        print(f"{key:>18}: {value:,.3f}" if isinstance(value, float) else f"{key:>18}: {value:,}")
+
+
+if __name__ == "__main__":
+    main()
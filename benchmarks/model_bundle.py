@@ -0,0 +1,49 @@
+"""Load time and allocated memory: unpickling ``data_model.pkl`` versus the model bundle.
+
+Run from the repository root:
+
+    python -m benchmarks.model_bundle --model data_model.pkl --bundle data_model
+"""
+import argparse
+import time
+import tracemalloc
+
+import joblib
+
+from model_bundle import load_bundle
+
+
+def measure(load):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def run(model_path, bundle_path):
+    # Mapped pages are shared page cache, not heap, so they do not show up here
+    _, pickle_seconds, pickle_mb = measure(lambda: joblib.load(model_path))
+    _, bundle_seconds, bundle_mb = measure(lambda: load_bundle(bundle_path))
+    return {
+        "pickle_seconds": pickle_seconds,
+        "pickle_peak_mb": pickle_mb,
+        "bundle_seconds": bundle_seconds,
+        "bundle_peak_mb": bundle_mb,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="data_model.pkl")
+    parser.add_argument("--bundle", default="data_model")
+    args = parser.parse_args()
+
+    for key, value in run(args.model, args.bundle).items():
+        print(f"{key:>15}: {value:,.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Queries per second of the vectorized engine versus ``model.kneighbors``.
+
+Run from the repository root:
+
+    python -m benchmarks.recommend --data data/data.csv --model data_model.pkl
+"""
+import argparse
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from recommender import RecommendationEngine
+
+
+def run(data, model, queries=200, top_n=20, seed=0):
+    engine = RecommendationEngine.from_model(data, model)
+    rows = np.random.default_rng(seed).choice(len(engine), size=queries, replace=False)
+    feature_names = list(model.feature_names_in_)
+
+    start = time.perf_counter()
+    expected = []
+    for row in rows:
+        # Same per-click path as the old Recommendations tab
+        query_point = pd.DataFrame(engine.matrix[row:row + 1], columns=feature_names)
+        _, indices = model.kneighbors(query_point, n_neighbors=top_n)
+        expected.append(indices[0])
+    knn_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [engine.recommend(row, top_n)[0] for row in rows]
+    engine_seconds = time.perf_counter() - start
+
+    overlap = np.mean([len(np.intersect1d(a, e)) / top_n for a, e in zip(actual, expected)])
+    return {
+        "catalog_size": len(engine),
+        "queries": queries,
+        "kneighbors_qps": queries / knn_seconds,
+        "engine_qps": queries / engine_seconds,
+        "speedup": knn_seconds / engine_seconds,
+        "neighbour_overlap": float(overlap),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--model", default="data_model.pkl")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-n", type=int, default=20)
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data, encoding="utf-8")
+    model = joblib.load(args.model)
+    for key, value in run(data, model, args.queries, args.top_n).items():
+        print(f"{key:>18}: {value:,.3f}" if isinstance(value, float) else f"{key:>18}: {value:,}")
+
+
+if __name__ == "__main__":
+    main()
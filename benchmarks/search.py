@@ -0,0 +1,62 @@
+"""Advanced Search latency: trigram index versus ``process.extract`` over the catalog.
+
+Run from the repository root:
+
+    python -m benchmarks.search --data data/data.csv --queries 20
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from fuzzywuzzy import process
+
+from search_index import LIMIT, MIN_SCORE, SearchIndex
+
+
+def run(data, queries=20, seed=0):
+    start = time.perf_counter()
+    index = SearchIndex.from_data(data)
+    build_seconds = time.perf_counter() - start
+
+    # Queries are catalog titles, the way people actually search
+    sample = data["name"].sample(queries, random_state=seed).tolist()
+
+    start = time.perf_counter()
+    expected = []
+    for query in sample:
+        # The old per-keystroke path from the Advanced Search tab
+        choices = data["name"] + " - " + data["artists"]
+        matches = process.extract(query, choices, limit=LIMIT)
+        expected.append([match[1] for match in matches if match[1] > MIN_SCORE])
+    full_ms = (time.perf_counter() - start) * 1000 / queries
+
+    start = time.perf_counter()
+    actual = [[match[1] for match in index.extract(query) if match[1] > MIN_SCORE] for query in sample]
+    index_ms = (time.perf_counter() - start) * 1000 / queries
+
+    # Many titles tie on score, so compare the score lists rather than row ids
+    agreement = np.mean([a == e for a, e in zip(actual, expected)])
+    return {
+        "catalog_size": len(index),
+        "build_seconds": build_seconds,
+        "full_scan_ms": full_ms,
+        "index_ms": index_ms,
+        "speedup": full_ms / index_ms,
+        "score_agreement": float(agreement),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data, encoding="utf-8")
+    for key, value in run(data, args.queries).items():
+        print(f"{key:>15}: {value:,.3f}" if isinstance(value, float) else f"{key:>15}: {value:,}")
+
+
+if __name__ == "__main__":
+    main()
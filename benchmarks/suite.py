@@ -0,0 +1,207 @@
+"""Timings and peak memory of the app's hot paths, with a regression gate.
+
+A synthetic catalog of the requested size (see ``benchmarks.synthetic``)
+is written to a scratch directory together with its columnar copy and
+model bundle, then every path the app runs per session or per click is
+timed: warmup calls first, then the median of ``--repeat`` runs, and one
+extra run under ``tracemalloc`` for peak memory.
+
+Results are compared with the entry for the same size in
+``benchmarks/baseline.json``. The run fails (exit code 1) when any path is
+slower or needs more memory than ``--threshold`` allows. Baselines are
+machine specific; record one on the machine that runs the gate:
+
+    python -m benchmarks.suite --size 10k --save
+    python -m benchmarks.suite --size 10k
+    python -m benchmarks.suite --size 1m --paths recommend search filter
+"""
+import argparse
+import gc
+import json
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from analytics import Analytics
+from benchmarks.synthetic import SIZES, make_catalog, rows_for
+from catalog import convert, load_catalog
+from column_index import ColumnIndex
+from model_bundle import dataset_fingerprint, load_bundle, save_bundle
+from preprocessing import FEATURES, FeatureScaler
+from recommender import RecommendationEngine, diverse_recommendations
+from search_index import SearchIndex
+
+BASELINE = Path(__file__).with_name("baseline.json")
+# Allowed slowdown (or memory growth) before a path counts as a regression
+THRESHOLD = 0.25
+# Differences below these are timer and allocator noise, whatever the ratio
+NOISE_MS = 0.1
+NOISE_MB = 1.0
+
+
+def prepare(rows, base_dir, seed=0):
+    """Write ``data/data.csv``, its columnar copy and a model bundle under ``base_dir``."""
+    data_dir = base_dir / "data"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    make_catalog(rows, seed).to_csv(data_dir / "data.csv", index=False, encoding="utf-8")
+    convert(data_dir / "data.csv", data_dir / "catalog")
+    data = load_catalog(data_dir / "data.csv", data_dir / "catalog")
+    scaler = FeatureScaler.fit(data)
+    save_bundle(base_dir / "data_model", scaler.transform(data), FEATURES, scaler,
+                dataset_fingerprint(data, FEATURES))
+
+
+def render_insights(data):
+    """Every Music Insights chart from a cold ``Analytics``, serialized like ``st.plotly_chart``."""
+    analytics = Analytics(data, "benchmark")
+    features = ("danceability", "energy", "acousticness", "instrumentalness", "liveness", "valence")
+    means = analytics.feature_means(features)
+    x_centers, y_centers, counts = analytics.grid("energy", "tempo", 60)
+    figures = [
+        go.Figure(go.Scatterpolar(r=means.values, theta=means.index, fill="toself")),
+        px.bar(analytics.histogram("duration_ms", 50, 1 / 60000), x="center", y="count"),
+        px.imshow(analytics.correlation(("danceability", "energy", "loudness", "popularity")), text_auto=True),
+        px.bar(analytics.histogram("energy", 50), x="center", y="count"),
+        go.Figure(go.Heatmap(x=x_centers, y=y_centers, z=np.where(counts > 0, counts, np.nan))),
+        px.scatter(analytics.stratified_sample("energy", "tempo", 5000), x="energy", y="tempo"),
+    ]
+    return [figure.to_json() for figure in figures]
+
+
+def hot_paths(base_dir, queries=20, seed=0):
+    """Name -> ``(callable, operations per call)`` for every measured path."""
+    csv_path, catalog_dir = base_dir / "data" / "data.csv", base_dir / "data" / "catalog"
+    bundle_path = base_dir / "data_model"
+    data = load_catalog(csv_path, catalog_dir)
+    engine = RecommendationEngine.from_bundle(load_bundle(bundle_path, data), data)
+    search_index = SearchIndex.from_data(data)
+    column_index = ColumnIndex(data, ["year", "tempo"])
+
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(data), size=min(queries, len(data)), replace=False)
+    titles = data["name"].iloc[rows].tolist()
+    ranges = [{"year": (low, low + 10), "tempo": (90.0, 130.0)} for low in rng.integers(1921, 2011, len(rows))]
+    return {
+        "load_csv": (lambda: pd.read_csv(csv_path, encoding="utf-8"), 1),
+        "load_data": (lambda: load_catalog(csv_path, catalog_dir), 1),
+        "load_models": (lambda: load_bundle(bundle_path, data), 1),
+        "recommend": (lambda: [engine.recommend(row, 11) for row in rows], len(rows)),
+        "recommend_diverse": (lambda: [diverse_recommendations(engine, row, 10, 0.5) for row in rows], len(rows)),
+        "search_build": (lambda: SearchIndex.from_data(data), 1),
+        "search": (lambda: [search_index.search(title) for title in titles], len(titles)),
+        "filter": (lambda: [column_index.filter(bounds) for bounds in ranges], len(ranges)),
+        "insights": (lambda: render_insights(data), 1),
+    }
+
+
+def measure(function, operations=1, warmup=1, repeat=5):
+    """Median and best milliseconds per operation, and peak traced memory in MB."""
+    for _ in range(warmup):
+        function()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000 / operations)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"ms": float(np.median(timings)), "min_ms": float(min(timings)), "peak_mb": peak / 2**20}
+
+
+def run(size="10k", paths=None, warmup=1, repeat=5, queries=20, seed=0):
+    rows = rows_for(size)
+    with tempfile.TemporaryDirectory(prefix="amusic-bench-") as scratch:
+        base_dir = Path(scratch)
+        prepare(rows, base_dir, seed)
+        cases = hot_paths(base_dir, queries, seed)
+        results = {}
+        for name, (function, operations) in cases.items():
+            if paths is None or name in paths:
+                results[name] = measure(function, operations, warmup, repeat)
+    return {
+        "size": size,
+        "rows": rows,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "paths": results,
+    }
+
+
+def regressions(report, baseline, threshold=THRESHOLD):
+    """``(path, metric, baseline, current)`` for every measurement beyond ``threshold``."""
+    found = []
+    for name, current in report["paths"].items():
+        expected = baseline.get("paths", {}).get(name)
+        if expected is None:
+            continue
+        for metric, noise in (("ms", NOISE_MS), ("peak_mb", NOISE_MB)):
+            old, new = expected[metric], current[metric]
+            if new > old * (1 + threshold) and new - old > noise:
+                found.append((name, metric, old, new))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="10k", help=f"{', '.join(SIZES)} or a row count")
+    parser.add_argument("--paths", nargs="+", default=None, help="Only these paths (default: all)")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=20, help="Queries per timed call of per-click paths")
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--save", action="store_true", help="Record this run as the baseline for --size")
+    args = parser.parse_args()
+
+    report = run(args.size, args.paths, args.warmup, args.repeat, args.queries)
+    baselines = {}
+    if Path(args.baseline).exists():
+        with open(args.baseline, encoding="utf-8") as handle:
+            baselines = json.load(handle)
+    baseline = baselines.get(args.size, {})
+
+    print(f"{report['rows']:,} rows, peak RSS {report['max_rss_mb']:,.0f} MB")
+    print(f"{'path':>18} {'ms/op':>10} {'baseline':>10} {'change':>8} {'peak MB':>9}")
+    for name, result in report["paths"].items():
+        expected = baseline.get("paths", {}).get(name)
+        if expected:
+            change = f"{result['ms'] / expected['ms'] - 1:+.0%}" if expected["ms"] else "-"
+            print(f"{name:>18} {result['ms']:>10.3f} {expected['ms']:>10.3f} {change:>8} {result['peak_mb']:>9.1f}")
+        else:
+            print(f"{name:>18} {result['ms']:>10.3f} {'-':>10} {'-':>8} {result['peak_mb']:>9.1f}")
+
+    if args.save:
+        if args.paths is not None:
+            # Keep the measurements of paths that were not run this time
+            report["paths"] = {**baseline.get("paths", {}), **report["paths"]}
+        baselines[args.size] = report
+        with open(args.baseline, "w", encoding="utf-8") as handle:
+            json.dump(baselines, handle, indent=2)
+        print(f"Saved baseline for {args.size} to {args.baseline}")
+        return
+
+    failed = regressions(report, baseline, args.threshold)
+    for name, metric, old, new in failed:
+        print(f"REGRESSION {name} {metric}: {old:,.3f} -> {new:,.3f} (+{new / old - 1:.0%})")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Synthetic song catalogs with the same schema as ``data/data.csv``.
+
+Feature distributions are rough imitations of the Spotify dataset
+(skewed instrumentalness and speechiness, tempo around 120 BPM, a few
+tracks per artist), which is enough to exercise every code path at sizes
+the real file does not come in.
+
+    python -m benchmarks.synthetic --size 1m --out /tmp/catalog_1m.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+SIZES = {"10k": 10_000, "170k": 170_000, "1m": 1_000_000}
+COLUMNS = ["valence", "year", "acousticness", "artists", "danceability", "duration_ms", "energy",
+           "explicit", "id", "instrumentalness", "key", "liveness", "loudness", "mode", "name",
+           "popularity", "release_date", "speechiness", "tempo"]
+WORDS = ["love", "night", "blue", "fire", "dream", "heart", "rain", "moon", "song", "dance", "sun",
+         "girl", "road", "home", "time", "city", "summer", "baby", "river", "gold", "wild", "light"]
+
+
+def rows_for(size):
+    """Row count of a named size (``"170k"``) or a plain number."""
+    return SIZES[size] if size in SIZES else int(size)
+
+
+def make_catalog(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS, dtype=object)
+    artists = np.array([f"Artist {i}" for i in range(max(1, rows // 8))], dtype=object)
+
+    name_words = words[rng.integers(0, len(words), (rows, 3))]
+    name_lengths = rng.integers(1, 4, rows)
+    names = [" ".join(parts[:length]).title() for parts, length in zip(name_words, name_lengths)]
+    first, second = artists[rng.integers(0, len(artists), (2, rows))]
+    featuring = rng.random(rows) < 0.1
+    artist_lists = [f"['{a}', '{b}']" if both else f"['{a}']" for a, b, both in zip(first, second, featuring)]
+
+    year = rng.integers(1921, 2021, rows)
+    return pd.DataFrame({
+        "valence": rng.beta(2, 2, rows),
+        "year": year,
+        "acousticness": rng.beta(0.7, 0.9, rows),
+        "artists": artist_lists,
+        "danceability": rng.beta(5, 4, rows),
+        "duration_ms": rng.gamma(9, 25_000, rows).astype(np.int64) + 30_000,
+        "energy": rng.beta(2, 1.6, rows),
+        "explicit": (rng.random(rows) < 0.08).astype(np.int64),
+        "id": [f"{seed:02x}{i:020x}" for i in range(rows)],
+        "instrumentalness": rng.beta(0.2, 1.5, rows),
+        "key": rng.integers(0, 12, rows),
+        "liveness": rng.beta(1.5, 6, rows),
+        "loudness": -rng.gamma(3, 3.5, rows),
+        "mode": (rng.random(rows) < 0.7).astype(np.int64),
+        "name": names,
+        "popularity": np.clip(rng.normal(32, 21, rows), 0, 100).astype(np.int64),
+        "release_date": year.astype(str),
+        "speechiness": rng.beta(0.8, 8, rows),
+        "tempo": np.clip(rng.normal(117, 30, rows), 0, 244),
+    }, columns=COLUMNS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic catalog with the schema of data.csv.")
+    parser.add_argument("--size", default="170k", help=f"{', '.join(SIZES)} or a row count")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="synthetic.csv")
+    args = parser.parse_args()
+
+    data = make_catalog(rows_for(args.size), args.seed)
+    data.to_csv(args.out, index=False, encoding="utf-8")
+    print(f"Wrote {len(data):,} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
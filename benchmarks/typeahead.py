@@ -0,0 +1,80 @@
+"""Seed Song picker: full-title selectbox versus the typeahead and id lookup.
+
+Run from the repository root:
+
+    python -m benchmarks.typeahead --data data/data.csv --queries 200
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from typeahead import Typeahead
+
+
+def run(data, queries=200, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(data), size=min(queries, len(data)), replace=False)
+    titles = data["name"].iloc[rows].astype(str).tolist()
+    # What people type before picking: the first few characters of a title
+    prefixes = [title[:int(length)] for title, length in zip(titles, rng.integers(2, 8, len(titles)))]
+    song_ids = data["id"].iloc[rows].tolist()
+
+    start = time.perf_counter()
+    options = data["name"].unique()
+    payload = len(json.dumps(options.tolist()))
+    unique_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for title in titles:
+        # The old handler's lookup of the selected title
+        data.index[data["name"] == title].tolist()[0]
+    scan_ms = (time.perf_counter() - start) * 1000 / len(titles)
+
+    start = time.perf_counter()
+    typeahead = Typeahead(data)
+    id_index = pd.Index(data["id"])
+    id_index.get_loc(song_ids[0])  # Builds the hash table
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    completions = [typeahead.complete(prefix) for prefix in prefixes]
+    complete_ms = (time.perf_counter() - start) * 1000 / len(prefixes)
+    payloads = [len(json.dumps([typeahead.label(row) for row in found])) for found in completions]
+
+    names = data["name"].to_numpy()
+    start = time.perf_counter()
+    for song_id in song_ids:
+        row = id_index.get_loc(song_id)
+        typeahead.rows_named(names[row])
+    lookup_ms = (time.perf_counter() - start) * 1000 / len(song_ids)
+
+    return {
+        "catalog_size": len(data),
+        "selectbox_options": len(options),
+        "selectbox_kb": payload / 1024,
+        "unique_ms": unique_ms,
+        "typeahead_kb": float(np.mean(payloads)) / 1024,
+        "complete_ms": complete_ms,
+        "build_seconds": build_seconds,
+        "scan_lookup_ms": scan_ms,
+        "id_lookup_ms": lookup_ms,
+        "lookup_speedup": scan_ms / lookup_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data, encoding="utf-8")
+    for key, value in run(data, args.queries).items():
+        print(f"{key:>18}: {value:,.3f}" if isinstance(value, float) else f"{key:>18}: {value:,}")
+
+
+if __name__ == "__main__":
+    main()
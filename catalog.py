@@ -0,0 +1,254 @@
+"""Columnar binary copy of the song catalog, memory-mapped at startup.
+
+``pd.read_csv`` on the full Spotify dataset takes seconds and about twice
+the final memory while parsing, and every server process pays it again.
+``convert`` writes each numeric column to its own ``.npy`` file and each
+string column as ``int32`` codes plus a JSON dictionary of distinct values.
+``load_catalog`` memory-maps the numeric columns read-only, so startup is
+near-instant and processes on one host share the same physical pages. It
+falls back to the CSV whenever the binary copy is missing or stale.
+``write_revision`` is used by ``ingest.py`` to publish an updated catalog
+next to the one being served.
+
+Columns are kept compact (see ``compact``): float32 features, the
+narrowest integer type that holds each integer column, and categoricals
+for string columns with few distinct values such as ``artists`` and
+``release_date``. ``track_records`` reads just the rows a page renders
+into ``Track`` objects instead of a Series per row.
+
+    python catalog.py --data data/data.csv --out data/catalog
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CATALOG_VERSION = 1
+MANIFEST = "manifest.json"
+# String columns with at most this share of distinct values are stored as categoricals
+CATEGORY_SHARE = 0.5
+# What a rendered track card shows; columns missing from the catalog come back as None
+TRACK_FIELDS = ("id", "name", "artists", "year", "tempo", "danceability", "energy")
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path):
+    stat = Path(path).stat()
+    return {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": file_sha256(path)}
+
+
+def compact_array(values):
+    """``values`` as float32 if floating, or as the narrowest signed integer type holding them."""
+    if values.dtype.kind == "f":
+        return values.astype(np.float32, copy=False)
+    if values.dtype.kind in "iu" and len(values):
+        low, high = values.min(), values.max()
+        for dtype in (np.int8, np.int16, np.int32):
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                return values.astype(dtype, copy=False)
+    return values
+
+
+def compact(data):
+    """``data`` with compact numeric columns and low-cardinality strings as categoricals.
+
+    Features are hashed as float32 by ``model_bundle.dataset_fingerprint``,
+    so bundles fingerprinted on the float64 catalog stay valid.
+    """
+    columns = {}
+    for column in data.columns:
+        values = data[column]
+        if isinstance(values.dtype, np.dtype) and values.dtype.kind in "iuf":
+            values = compact_array(values.to_numpy())
+        elif not isinstance(values.dtype, pd.CategoricalDtype) and pd.api.types.is_string_dtype(values):
+            if values.nunique() <= CATEGORY_SHARE * len(values):
+                values = values.astype("category")
+        columns[column] = values
+    return pd.DataFrame(columns, index=data.index, copy=False)
+
+
+def write_columns(data, out_dir):
+    """Write every column of ``data`` under ``out_dir``; returns the column schema."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    schema = []
+    for position, column in enumerate(data.columns):
+        values = data[column]
+        stem = f"{position:03d}"
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            np.save(out_dir / f"{stem}.npy", np.ascontiguousarray(compact_array(values.to_numpy())))
+            schema.append({"name": column, "kind": "numeric", "file": f"{stem}.npy"})
+        else:
+            codes, uniques = pd.factorize(values, use_na_sentinel=True)
+            np.save(out_dir / f"{stem}.codes.npy", codes.astype(np.int32))
+            with open(out_dir / f"{stem}.dict.json", "w", encoding="utf-8") as handle:
+                json.dump([str(value) for value in uniques], handle, ensure_ascii=False)
+            schema.append({"name": column, "kind": "string", "file": f"{stem}.codes.npy",
+                           "dictionary": f"{stem}.dict.json"})
+    return schema
+
+
+def convert(csv_path, out_dir):
+    """One-time conversion of ``csv_path`` into the columnar layout in ``out_dir``."""
+    data = pd.read_csv(csv_path, encoding="utf-8")
+    schema = write_columns(data, out_dir)
+    manifest = {
+        "version": CATALOG_VERSION,
+        "rows": len(data),
+        "columns": schema,
+        "source": source_fingerprint(csv_path),
+    }
+    # The manifest goes last so a half-written directory is never considered fresh
+    with open(Path(out_dir) / MANIFEST, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2)
+    return manifest
+
+
+def write_revision(data, out_dir, csv_path, changed_rows):
+    """Write ``data`` as the next revision of the catalog in ``out_dir``.
+
+    Columns go to a fresh ``r<revision>/`` subdirectory and the manifest,
+    written last with an atomic rename, records which rows changed since
+    the previous revision so running processes can update incrementally.
+    The revision before it is kept for readers that still map its files.
+    """
+    out_dir = Path(out_dir)
+    previous = read_manifest(out_dir)
+    parent = previous.get("revision", 0) if previous else None
+    revision = (parent or 0) + 1
+    stem = f"r{revision}"
+    schema = write_columns(data, out_dir / stem)
+    for column in schema:
+        for key in ("file", "dictionary"):
+            if key in column:
+                column[key] = f"{stem}/{column[key]}"
+    np.save(out_dir / stem / "changed.npy", np.asarray(changed_rows, dtype=np.int64))
+    manifest = {
+        "version": CATALOG_VERSION,
+        "revision": revision,
+        "parent": parent,
+        "changed": f"{stem}/changed.npy",
+        "rows": len(data),
+        "columns": schema,
+        "source": source_fingerprint(csv_path),
+    }
+    temporary = out_dir / f"{MANIFEST}.tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2)
+    os.replace(temporary, out_dir / MANIFEST)
+
+    for old in out_dir.iterdir():
+        if old.is_dir() and old.name[1:].isdigit() and int(old.name[1:]) < revision - 1:
+            shutil.rmtree(old, ignore_errors=True)
+        elif revision > 1 and old.is_file() and old.suffix in (".npy", ".json") and old.name != MANIFEST:
+            old.unlink(missing_ok=True)  # Columns of the original conversion
+    return manifest
+
+
+def read_manifest(out_dir):
+    try:
+        with open(Path(out_dir) / MANIFEST, encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(manifest, csv_path):
+    """Whether the binary copy still matches ``csv_path``.
+
+    An unchanged mtime and size are trusted as-is; otherwise the source is
+    re-hashed, so a touched-but-identical CSV is still served from the
+    binary copy.
+    """
+    if manifest is None or manifest.get("version") != CATALOG_VERSION:
+        return False
+    if not Path(csv_path).exists():
+        return True  # Only the binary copy was deployed
+    source = manifest["source"]
+    stat = Path(csv_path).stat()
+    if stat.st_size != source["size"]:
+        return False
+    if stat.st_mtime == source["mtime"]:
+        return True
+    return file_sha256(csv_path) == source["sha256"]
+
+
+def read_columns(out_dir, manifest):
+    """Assemble the catalog frame, memory-mapping numeric columns without copying.
+
+    Copies written before columns were compacted are narrowed on load, at
+    the cost of a private copy of each such column.
+    """
+    out_dir = Path(out_dir)
+    columns = {}
+    for column in manifest["columns"]:
+        codes = np.load(out_dir / column["file"], mmap_mode="r")
+        if column["kind"] == "numeric":
+            columns[column["name"]] = compact_array(codes)
+            continue
+        with open(out_dir / column["dictionary"], encoding="utf-8") as handle:
+            dictionary = json.load(handle)
+        if len(dictionary) <= CATEGORY_SHARE * manifest["rows"]:
+            try:
+                # The codes were written by ``write_columns``; -1 is already the categorical's missing value
+                columns[column["name"]] = pd.Categorical.from_codes(codes, categories=dictionary, validate=False)
+                continue
+            except ValueError:
+                pass  # Distinct values that print the same, e.g. 1 and "1"
+        values = np.asarray(dictionary + [None], dtype=object)
+        # Code -1 (missing) picks the trailing None
+        columns[column["name"]] = values[codes]
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_catalog(csv_path, out_dir):
+    """The catalog from the binary copy in ``out_dir`` when fresh, else from ``csv_path``."""
+    manifest = read_manifest(out_dir)
+    if is_fresh(manifest, csv_path):
+        return read_columns(out_dir, manifest)
+    return compact(pd.read_csv(csv_path, encoding="utf-8"))
+
+
+class Track:
+    """The ``TRACK_FIELDS`` of one catalog row as plain Python values."""
+
+    __slots__ = ("row",) + TRACK_FIELDS
+
+    def __init__(self, row, values):
+        self.row = row
+        for field, value in zip(TRACK_FIELDS, values):
+            setattr(self, field, value)
+
+
+def track_records(data, rows):
+    """A ``Track`` for each of ``rows``, reading only those rows of each column."""
+    rows = np.asarray(rows, dtype=np.intp)
+    columns = [data[field].take(rows).tolist() if field in data.columns else [None] * len(rows)
+               for field in TRACK_FIELDS]
+    return [Track(row, values) for row, values in zip(rows.tolist(), zip(*columns))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the song catalog to memory-mappable columns.")
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--out", default="data/catalog")
+    args = parser.parse_args()
+
+    manifest = convert(args.data, args.out)
+    print(f"Wrote {manifest['rows']:,} rows x {len(manifest['columns'])} columns to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Pre-sorted column indexes for range filters, and cursor pagination.
+
+``data[data["year"].between(a, b) & data["tempo"].between(c, d)]`` builds
+full-length boolean masks and copies every matching row on each rerun.
+``ColumnIndex`` argsorts each filterable column once, so a range is two
+``searchsorted`` calls and a slice of row positions. Several ranges are
+combined by taking the narrowest slice and checking the other columns on
+just those rows. Callers get positions back and ``page`` hands them out a
+page at a time, so only the rows on screen are ever materialized.
+``updated`` merges in the rows an ingestion added or changed, and
+``selectivity`` estimates how many rows a set of ranges keeps, which is
+what filtered recommendations use to choose a strategy.
+"""
+import numpy as np
+
+PAGE_SIZE = 10
+
+
+class ColumnIndex:
+    """Sorted row order of selected numeric columns of one catalog."""
+
+    def __init__(self, data, columns):
+        self.size = len(data)
+        self.values = {}
+        self.order = {}
+        self.sorted = {}
+        for column in columns:
+            if column not in data.columns:
+                continue
+            values = data[column].to_numpy()
+            order = np.argsort(values, kind="stable")
+            self.values[column] = values
+            self.order[column] = order
+            self.sorted[column] = values[order]
+
+    def updated(self, data, rows):
+        """A new index over ``data`` in which only positions ``rows`` are new or changed.
+
+        Changed rows are dropped from each sorted order and all of ``rows``
+        are merged back in with ``searchsorted``, without re-sorting the rest.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        index = object.__new__(type(self))
+        index.size = len(data)
+        index.values, index.order, index.sorted = {}, {}, {}
+        for column, order in self.order.items():
+            values = data[column].to_numpy()
+            order = order[~np.isin(order, rows)]
+            new_order = rows[np.argsort(values[rows], kind="stable")]
+            positions = np.searchsorted(values[order], values[new_order], side="right")
+            order = np.insert(order, positions, new_order)
+            index.values[column] = values
+            index.order[column] = order
+            index.sorted[column] = values[order]
+        return index
+
+    def __contains__(self, column):
+        return column in self.values
+
+    def range(self, column, low, high):
+        """Positions of rows with ``low <= column <= high``, in ``column`` order."""
+        sorted_values = self.sorted[column]
+        start = np.searchsorted(sorted_values, low, side="left")
+        stop = np.searchsorted(sorted_values, high, side="right")
+        return self.order[column][start:stop]
+
+    def count(self, column, low, high):
+        """Number of rows with ``low <= column <= high``, without materializing them."""
+        sorted_values = self.sorted[column]
+        return int(np.searchsorted(sorted_values, high, side="right") - np.searchsorted(sorted_values, low, side="left"))
+
+    def selectivity(self, ranges):
+        """Estimated share of rows matching every range, assuming the columns are independent."""
+        share = 1.0
+        for column, (low, high) in ranges.items():
+            if column in self and self.size:
+                share *= self.count(column, low, high) / self.size
+        return share
+
+    def matches(self, ranges, rows):
+        """Boolean mask of the ``rows`` that match every indexed range."""
+        rows = np.asarray(rows, dtype=np.intp)
+        keep = np.ones(len(rows), dtype=bool)
+        for column, (low, high) in ranges.items():
+            if column in self:
+                values = self.values[column][rows]
+                keep &= (values >= low) & (values <= high)
+        return keep
+
+    def filter(self, ranges, rows=None):
+        """Row positions matching every ``column: (low, high)`` in ``ranges``.
+
+        Without ``rows`` the whole catalog is filtered and positions come back
+        in catalog order; with ``rows`` (e.g. search hits) their order is kept.
+        Columns that are not indexed are ignored.
+        """
+        ranges = {column: bounds for column, bounds in ranges.items() if column in self}
+        if rows is None:
+            if not ranges:
+                return np.arange(self.size)
+            slices = {column: self.range(column, *bounds) for column, bounds in ranges.items()}
+            narrowest = min(slices, key=lambda column: len(slices[column]))
+            rows = np.sort(slices.pop(narrowest))
+            ranges = {column: ranges[column] for column in slices}
+        rows = np.asarray(rows, dtype=np.intp)
+        return rows[self.matches(ranges, rows)]
+
+
+def page(rows, cursor=0, size=PAGE_SIZE):
+    """The ``size`` positions of ``rows`` after ``cursor`` and the next cursor (``None`` at the end)."""
+    stop = cursor + size
+    return rows[cursor:stop], (stop if stop < len(rows) else None)
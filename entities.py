@@ -0,0 +1,68 @@
+"""Similar artists, genres and eras from the notebook's per-aggregate models.
+
+The notebook fits one ``NearestNeighbors`` per aggregate table and its
+``column_mapping`` names the column that identifies each row. This module
+serves those tables through the same ``RecommendationEngine`` as tracks.
+Each entity type is loaded on first use, so types nobody asks for cost
+no startup time or memory.
+"""
+import threading
+from pathlib import Path
+
+import joblib
+import pandas as pd
+
+from recommender import RecommendationEngine
+
+# Entity type -> aggregate table, identifying column and shipped model
+ENTITIES = {
+    "artist": ("data/data_by_artist.csv", "artists", "data_by_artist_model.pkl"),
+    "genre": ("data/data_by_genres.csv", "genres", "data_by_genres_model.pkl"),
+    "year": ("data/data_by_year.csv", "year", "data_by_year_model.pkl"),
+}
+
+
+class EntityService:
+    """Lazily loaded engines for the aggregate entity types."""
+
+    def __init__(self, base_dir):
+        self.base_dir = Path(base_dir)
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def paths(self, entity):
+        table, _, model = ENTITIES[entity]
+        return self.base_dir / table, self.base_dir / model
+
+    def available(self):
+        """Entity types whose table and model both exist on disk."""
+        return [entity for entity in ENTITIES if all(path.exists() for path in self.paths(entity))]
+
+    def load(self, entity):
+        """``(table, engine)`` for ``entity``, loaded once and then shared."""
+        if entity not in self._loaded:
+            with self._lock:
+                if entity not in self._loaded:
+                    table_path, model_path = self.paths(entity)
+                    column = ENTITIES[entity][1]
+                    table = pd.read_csv(table_path, encoding="utf-8")
+                    engine = RecommendationEngine.from_model(table, joblib.load(model_path), id_column=column)
+                    self._loaded[entity] = (table, engine)
+        return self._loaded[entity]
+
+    def names(self, entity):
+        table, _ = self.load(entity)
+        return table[ENTITIES[entity][1]]
+
+    def similar(self, entity, key, top_n=5):
+        """The ``top_n`` rows most similar to ``key``, with a ``similarity`` column."""
+        table, engine = self.load(entity)
+        row = engine.rows_for([key])[0]
+        indices, scores = engine.recommend(row, top_n + 1)
+        keep = indices != row
+        return table.iloc[indices[keep][:top_n]].assign(similarity=scores[keep][:top_n])
+
+    def recommend_batch(self, entity, keys, top_n, diversity=0.0, block_size=None):
+        """Same streamed interface as ``RecommendationEngine.recommend_batch`` for tracks."""
+        _, engine = self.load(entity)
+        return engine.recommend_batch(keys, top_n, diversity, block_size)
@@ -0,0 +1,274 @@
+"""Offline evaluation of the recommender over the whole catalog.
+
+The notebook's MSE cell and ``evaluate_model_cosine`` build a one-row
+DataFrame and call ``kneighbors`` once per song, which takes hours on the
+full dataset. Here the seeds are split into chunks and scored by a
+process pool. Each worker runs blocked all-pairs top-k
+(``RecommendationEngine.recommend_rows``) over feature matrices placed
+once in shared memory, so no worker copies or re-pickles the catalog.
+Per seed it measures the recommended list (seed excluded):
+
+* ``mse`` - the notebook's error between a song's scaled features and the
+  mean of its recommendations';
+* ``mean_cosine_similarity`` - ``evaluate_model_cosine``'s score;
+* ``recall_at_k`` - overlap with exact search (below 1 for ``--index`` or
+  ``--diversity``);
+* ``catalog_coverage`` - share of the catalog recommended at least once;
+* ``intra_list_diversity`` - mean cosine distance between songs of a list.
+
+The JSON report records the catalog and model versions next to the
+metrics; ``--compare`` prints the change against an earlier report.
+
+    python evaluate.py --out evaluation.json
+    python evaluate.py --index data_model_ivfpq.npz --nprobe 4 --compare evaluation.json
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from ann_index import IVFPQIndex
+from model_bundle import dataset_fingerprint, load_bundle
+from recommender import POOL_FACTOR, RecommendationEngine, mmr_rerank
+from result_cache import model_version
+
+# Seeds handed to a worker at a time
+CHUNK_SIZE = 2048
+METRICS = ["mse", "mean_cosine_similarity", "recall_at_k", "catalog_coverage", "intra_list_diversity"]
+
+_worker = {}
+
+
+def share(array):
+    """Copy ``array`` into a new shared-memory block; returns the block and how to attach to it."""
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=block.buf)[:] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def attach(spec):
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype, buffer=block.buf)
+
+
+def init_worker(config):
+    """Map the shared matrices and load the index under test once per worker process."""
+    from threadpoolctl import threadpool_limits
+
+    if config["workers"] > 1:
+        threadpool_limits(1)  # Processes already use every core
+    matrix_block, matrix = attach(config["matrix"])
+    scaled_block, scaled = attach(config["scaled"])
+    _worker["blocks"] = [matrix_block, scaled_block]
+    _worker["engine"] = RecommendationEngine(matrix, config["feature_names"], normalized=True)
+    _worker["scaled"] = scaled
+    _worker["index"] = IVFPQIndex.load(config["index"], config["nprobe"]) if config["index"] else None
+    _worker["top_n"] = config["top_n"]
+    _worker["diversity"] = config["diversity"]
+
+
+def approximate_rows(index, matrix, seeds, k):
+    """Top-k of ``index`` for each seed, seed excluded; short lists are padded with -1."""
+    indices = np.full((len(seeds), k), -1, dtype=np.intp)
+    scores = np.zeros((len(seeds), k), dtype=np.float32)
+    for i, seed in enumerate(seeds):
+        found, similarity = index.search(matrix[seed], k + 1)
+        keep = found != seed
+        found, similarity = found[keep][:k], similarity[keep][:k]
+        indices[i, :len(found)] = found
+        scores[i, :len(found)] = similarity
+    return indices, scores
+
+
+def list_metrics(seeds, served, scores, exact, matrix, scaled):
+    """Metric sums for one block of recommendation lists (``-1`` marks an empty slot)."""
+    valid = served >= 0
+    served = np.where(valid, served, 0)
+    counts = valid.sum(axis=1)
+    filled = counts > 0
+    top_n = served.shape[1]
+
+    features = scaled[served] * valid[..., None]
+    predicted = features.sum(axis=1) / np.maximum(counts, 1)[:, None]
+    squared_error = ((scaled[seeds] - predicted)[filled] ** 2).sum()
+
+    similarity = (np.where(valid, scores, 0).sum(axis=1)[filled] / counts[filled]).sum()
+    hits = ((served[:, :, None] == exact[:, None, :]) & valid[:, :, None]).any(axis=2).sum()
+
+    vectors = matrix[served]
+    pairwise = np.einsum("snd,smd->snm", vectors, vectors)
+    pairs = valid[:, :, None] & valid[:, None, :] & ~np.eye(top_n, dtype=bool)
+    n_pairs = pairs.sum(axis=(1, 2))
+    listed = n_pairs > 0
+    distance = (np.where(pairs, 1.0 - pairwise, 0).sum(axis=(1, 2))[listed] / n_pairs[listed]).sum()
+    return {
+        "seeds": len(seeds),
+        "squared_error": float(squared_error),
+        "error_terms": int(filled.sum()) * scaled.shape[1],
+        "similarity": float(similarity),
+        "similarity_lists": int(filled.sum()),
+        "hits": int(hits),
+        "distance": float(distance),
+        "distance_lists": int(listed.sum()),
+        "covered": np.unique(served[valid]),
+    }
+
+
+def evaluate_chunk(rows):
+    """Metric sums for the seed ``rows``; runs inside a worker."""
+    engine, scaled, index = _worker["engine"], _worker["scaled"], _worker["index"]
+    top_n, diversity = _worker["top_n"], _worker["diversity"]
+    pool = top_n * POOL_FACTOR if diversity > 0 else top_n
+    totals = None
+    for seeds, exact, scores in engine.recommend_rows(rows, pool):
+        served, served_scores = exact, scores
+        if index is not None:
+            served, served_scores = approximate_rows(index, engine.matrix, seeds, pool)
+        if diversity > 0:
+            vectors = engine.matrix[np.maximum(served, 0)]
+            pairwise = np.einsum("spd,sqd->spq", vectors, vectors)
+            relevance = np.where(served >= 0, served_scores, -np.inf)
+            picks = mmr_rerank(relevance, pairwise, top_n, diversity)
+            served = np.take_along_axis(served, picks, axis=1)
+            served_scores = np.take_along_axis(served_scores, picks, axis=1)
+        block = list_metrics(seeds, served, served_scores, exact[:, :top_n], engine.matrix, scaled)
+        totals = block if totals is None else merge_totals(totals, block)
+    return totals
+
+
+def merge_totals(totals, block):
+    merged = {key: totals[key] + block[key] for key in totals if key != "covered"}
+    merged["covered"] = np.union1d(totals["covered"], block["covered"])
+    return merged
+
+
+def evaluate(matrix, scaled, feature_names, rows, top_n=5, diversity=0.0, index=None, nprobe=8,
+             workers=None, chunk_size=CHUNK_SIZE):
+    """Evaluate the lists recommended for catalog ``rows``; returns the metrics dict.
+
+    ``matrix`` holds the normalized vectors the engine searches and
+    ``scaled`` the min-max scaled features the notebook's MSE is measured
+    on. ``index`` is the path of a saved ``IVFPQIndex`` to evaluate instead
+    of exact search.
+    """
+    workers = workers or os.cpu_count() or 1
+    rows = np.asarray(rows, dtype=np.intp)
+    chunks = [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]
+    matrix_block, matrix_spec = share(matrix)
+    scaled_block, scaled_spec = share(scaled)
+    config = {
+        "matrix": matrix_spec, "scaled": scaled_spec, "feature_names": list(feature_names),
+        "index": str(index) if index else None, "nprobe": nprobe, "top_n": top_n,
+        "diversity": diversity, "workers": workers,
+    }
+    totals = None
+    try:
+        if workers == 1:
+            init_worker(config)
+            partials = list(map(evaluate_chunk, chunks))
+        else:
+            with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(config,)) as executor:
+                partials = list(executor.map(evaluate_chunk, chunks))
+        for partial in partials:
+            totals = partial if totals is None else merge_totals(totals, partial)
+    finally:
+        _worker.clear()
+        for block in (matrix_block, scaled_block):
+            block.close()
+            block.unlink()
+
+    return {
+        "mse": totals["squared_error"] / max(totals["error_terms"], 1),
+        "mean_cosine_similarity": totals["similarity"] / max(totals["similarity_lists"], 1),
+        "recall_at_k": totals["hits"] / (totals["seeds"] * top_n),
+        "catalog_coverage": len(totals["covered"]) / len(matrix),
+        "intra_list_diversity": totals["distance"] / max(totals["distance_lists"], 1),
+    }
+
+
+def load_model(data, bundle_path, model_path):
+    """The bundle when present (as served), else the notebook's pickle; returns ``(model, engine)``."""
+    if bundle_path and (Path(bundle_path) / "manifest.json").exists():
+        model = load_bundle(bundle_path, data)
+        return model, RecommendationEngine.from_bundle(model, data)
+    model = joblib.load(model_path)
+    return model, RecommendationEngine.from_model(data, model)
+
+
+def compare(report, baseline):
+    """Lines showing each metric of ``report`` next to ``baseline``."""
+    lines = [f"{'metric':>22} {'baseline':>10} {'current':>10} {'change':>10}"]
+    for name in METRICS:
+        old, new = baseline["metrics"].get(name), report["metrics"][name]
+        if old is None:
+            lines.append(f"{name:>22} {'-':>10} {new:>10.4f} {'-':>10}")
+        else:
+            lines.append(f"{name:>22} {old:>10.4f} {new:>10.4f} {new - old:>+10.4f}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate recommendations over the whole catalog.")
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--bundle", default="data_model", help="Model bundle (used when it exists)")
+    parser.add_argument("--model", default="data_model.pkl")
+    parser.add_argument("--index", default=None, help="Saved IVF-PQ index to evaluate instead of exact search")
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--diversity", type=float, default=0.0)
+    parser.add_argument("--sample", type=int, default=None, help="Evaluate this many random seeds")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--out", default="evaluation.json")
+    parser.add_argument("--compare", default=None, help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data, encoding="utf-8")
+    model, engine = load_model(data, args.bundle, args.model)
+    rows = np.arange(len(engine))
+    if args.sample and args.sample < len(rows):
+        rows = np.sort(np.random.default_rng(0).choice(rows, size=args.sample, replace=False))
+
+    start = time.perf_counter()
+    metrics = evaluate(engine.matrix, engine.scaler.transform(data), engine.feature_names, rows,
+                       args.top_n, args.diversity, args.index, args.nprobe, args.workers, args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "catalog": {"path": args.data, "rows": len(data),
+                    "sha256": dataset_fingerprint(data, engine.feature_names)},
+        "model": model_version(model, args.model),
+        "index": {"path": args.index, "nprobe": args.nprobe} if args.index else "exact",
+        "top_n": args.top_n,
+        "diversity": args.diversity,
+        "seeds": len(rows),
+        "workers": args.workers or os.cpu_count() or 1,
+        "seconds": round(elapsed, 3),
+        "metrics": metrics,
+    }
+    with open(args.out, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+
+    print(f"Evaluated {len(rows):,} seeds in {elapsed:.1f}s -> {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        print("\n".join(compare(report, baseline)))
+    else:
+        for name in METRICS:
+            print(f"{name:>22}: {metrics[name]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
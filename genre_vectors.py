@@ -0,0 +1,178 @@
+"""Sparse genre vectors and hybrid audio-plus-genre recommendations.
+
+Audio features alone let acoustically similar tracks from unrelated
+genres crowd the results. ``GenreVectors`` holds one L2-normalized row
+of genre weights per track in a CSR matrix, so the genre overlap of a
+seed with the whole catalog is a single sparse product instead of
+per-row set intersections. The product is taken column by column (from
+a CSC copy), which touches only the tracks sharing one of the seed's few
+genres rather than every row. Track genres come from:
+
+* ``data/data_w_genres.csv`` (genres per artist) when it is present: a
+  track gets the genres of all its artists;
+* otherwise the ``data/data_by_genres.csv`` profiles: a track gets the
+  ``PROFILE_GENRES`` genres whose average audio profile is closest to it.
+
+``HybridEngine`` scores ``(1 - weight) * audio + weight * genre`` and can
+be used wherever a ``RecommendationEngine`` is (``diverse_recommendations``,
+``filtered_recommendations``).
+"""
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from recommender import normalize_rows, top_k_indices, top_k_rows
+
+# Closest genre profiles assigned to a track when only data_by_genres.csv is available
+PROFILE_GENRES = 3
+# Tracks scored against the genre profiles at a time
+BLOCK_ROWS = 4096
+# Quoted items of a "['a', "b's"]" list as stored in the Spotify CSVs
+LIST_ITEM = re.compile(r"'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\"")
+
+
+def parse_list(text):
+    """Items of a list column such as ``"['pop', 'dance pop']"``; plain strings are one item."""
+    if not isinstance(text, str):
+        return []
+    text = text.strip()
+    if not text.startswith("["):
+        return [text] if text else []
+    return [single or double for single, double in LIST_ITEM.findall(text)]
+
+
+def normalize_sparse(matrix):
+    """CSR float32 copy of ``matrix`` with unit-length rows (empty rows stay empty)."""
+    matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1.0 / norms).dot(matrix), dtype=np.float32)
+
+
+def membership(lists, vocabulary):
+    """Binary CSR matrix with a row per list and a column per ``vocabulary`` item it contains."""
+    lengths = np.fromiter((len(items) for items in lists), dtype=np.int64, count=len(lists))
+    columns = pd.Index(vocabulary).get_indexer([item for items in lists for item in items])
+    rows = np.repeat(np.arange(len(lists)), lengths)
+    known = columns >= 0
+    values = np.ones(int(known.sum()), dtype=np.float32)
+    matrix = sparse.csr_matrix((values, (rows[known], columns[known])), shape=(len(lists), len(vocabulary)))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1.0
+    return matrix
+
+
+class GenreVectors:
+    """Unit genre-weight rows aligned with the catalog, as a CSR matrix."""
+
+    def __init__(self, matrix, genres, source):
+        self.matrix = normalize_sparse(matrix)
+        self.columns = self.matrix.tocsc()  # Tracks per genre
+        self.genres = np.asarray(genres, dtype=object)
+        self.source = source
+
+    @classmethod
+    def from_artists(cls, data, artist_genres):
+        """Genres of every artist credited on a track, from a ``data_w_genres`` table."""
+        artist_genres = artist_genres.drop_duplicates("artists")
+        genre_lists = [parse_list(text) for text in artist_genres["genres"]]
+        genres = sorted({genre for genres in genre_lists for genre in genres})
+        by_artist = membership(genre_lists, genres)
+        credits = membership([parse_list(text) for text in data["artists"]], artist_genres["artists"].tolist())
+        return cls(credits @ by_artist, genres, "data_w_genres")
+
+    @classmethod
+    def from_profiles(cls, engine, profiles, per_track=PROFILE_GENRES):
+        """The ``per_track`` genres whose ``data_by_genres`` audio profile is closest to each track."""
+        profiles = profiles.dropna(subset=engine.feature_names)
+        centroids = normalize_rows(engine.scaler.transform(profiles))
+        per_track = min(per_track, len(centroids))
+        columns = np.empty((len(engine), per_track), dtype=np.int64)
+        for start in range(0, len(engine), BLOCK_ROWS):
+            block = engine.matrix[start:start + BLOCK_ROWS]
+            columns[start:start + len(block)] = top_k_rows(block @ centroids.T, per_track)
+        rows = np.repeat(np.arange(len(engine)), per_track)
+        values = np.ones(rows.size, dtype=np.float32)
+        matrix = sparse.csr_matrix((values, (rows, columns.ravel())), shape=(len(engine), len(centroids)))
+        return cls(matrix, profiles["genres"].tolist(), "data_by_genres")
+
+    @staticmethod
+    def available(base_dir):
+        """Whether ``load`` has a genre table to build from."""
+        data_dir = Path(base_dir) / "data"
+        return (data_dir / "data_w_genres.csv").exists() or (data_dir / "data_by_genres.csv").exists()
+
+    @classmethod
+    def load(cls, base_dir, data, engine):
+        """From whichever genre table ships in ``base_dir/data``, or ``None`` without one."""
+        data_dir = Path(base_dir) / "data"
+        if (data_dir / "data_w_genres.csv").exists() and "artists" in data.columns:
+            table = pd.read_csv(data_dir / "data_w_genres.csv", usecols=["genres", "artists"], encoding="utf-8")
+            return cls.from_artists(data, table)
+        if (data_dir / "data_by_genres.csv").exists() and engine.scaler is not None:
+            return cls.from_profiles(engine, pd.read_csv(data_dir / "data_by_genres.csv", encoding="utf-8"))
+        return None
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def vector(self, row):
+        """Dense genre weights of catalog ``row``."""
+        start, stop = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        vector = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        vector[self.matrix.indices[start:stop]] = self.matrix.data[start:stop]
+        return vector
+
+    def similarities(self, row, rows=None):
+        """Genre cosine of ``row`` with every track, or just with ``rows``."""
+        if rows is not None:
+            return self.matrix[rows] @ self.vector(row)
+        return self.add_similarities(row, np.zeros(len(self), dtype=np.float32))
+
+    def add_similarities(self, row, scores, weight=1.0):
+        """Add ``weight`` times the genre cosine of ``row`` with every track to ``scores`` in place."""
+        start, stop = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        indptr, indices, data = self.columns.indptr, self.columns.indices, self.columns.data
+        for genre, value in zip(self.matrix.indices[start:stop], self.matrix.data[start:stop]):
+            # A genre lists each track once, so plain fancy-index addition is exact
+            tracks = slice(indptr[genre], indptr[genre + 1])
+            scores[indices[tracks]] += (weight * value) * data[tracks]
+        return scores
+
+    def genres_of(self, row):
+        start, stop = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        return self.genres[self.matrix.indices[start:stop]].tolist()
+
+
+class HybridEngine:
+    """A ``RecommendationEngine`` whose scores blend audio and genre similarity."""
+
+    def __init__(self, engine, genres, weight):
+        self.engine = engine
+        self.genres = genres
+        self.weight = weight
+
+    def __len__(self):
+        return len(self.engine)
+
+    def vectors_for(self, rows):
+        """Audio vectors, so diversity re-ranking still spreads over sound."""
+        return self.engine.vectors_for(rows)
+
+    def scores(self, row):
+        scores = self.engine.similarities(self.engine.matrix[row])
+        scores *= 1.0 - self.weight
+        return self.genres.add_similarities(row, scores, self.weight)
+
+    def seed_similarities(self, row, rows):
+        audio = self.engine.seed_similarities(row, rows)
+        return (1.0 - self.weight) * audio + self.weight * self.genres.similarities(row, rows)
+
+    def recommend(self, row, k):
+        """Top-k rows for catalog ``row`` by blended score, as ``(indices, scores)``."""
+        scores = self.scores(row)
+        indices = top_k_indices(scores, k)
+        return indices, scores[indices]
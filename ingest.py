@@ -0,0 +1,249 @@
+"""Incremental catalog ingestion with hot-swapped in-memory snapshots.
+
+New releases used to mean regenerating ``data.csv``, refitting the
+notebook's model and restarting the app. ``ingest`` instead merges a
+delta of new or changed tracks (keyed by ``id``) into the catalog:
+
+* updated tracks keep their row, new ones are appended;
+* only the delta is scaled with the bundle's fitted scaler (no refit) and
+  written into the model bundle's vectors;
+* ``data.csv`` is rewritten and the columnar copy is published as a new
+  revision (``catalog.write_revision``) that records which rows changed.
+
+Running processes hold a ``LiveCatalog``. It notices a new revision on
+disk and builds the next ``Snapshot`` from the current one: the search,
+filter and id indexes are updated for the changed rows only. It then
+swaps the snapshot in with one assignment. Requests in flight keep the
+snapshot they started with, so there is no downtime.
+
+    python ingest.py new_releases.csv
+"""
+import argparse
+import os
+import threading
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from catalog import is_fresh, load_catalog, read_manifest, write_revision
+from column_index import ColumnIndex
+from model_bundle import VECTORS, dataset_fingerprint, load_bundle, save_bundle
+from preprocessing import FEATURES
+from recommender import RecommendationEngine
+from search_index import SearchIndex, search_text
+from typeahead import Typeahead
+
+# Seconds between checks of the catalog manifest for a new revision
+CHECK_INTERVAL = 1.0
+# Columns the catalog indexes for range filters
+FILTER_COLUMNS = ["year", "tempo", "popularity"]
+
+
+def incomplete_rows(data, delta):
+    """Mask of ``delta`` rows missing an audio feature, or a value in an integer column of ``data``.
+
+    Features are needed to scale the row into the model's vectors, and a
+    NaN cannot be cast back to an integer column.
+    """
+    required = [column for column in data.columns if column in FEATURES or data[column].dtype.kind in "iu"]
+    return delta[required].isna().any(axis=1).to_numpy()
+
+
+def merge(data, delta, id_column="id"):
+    """``data`` with ``delta`` applied by id, and the positions of every changed row.
+
+    Rows whose id already exists are replaced in place; the rest are
+    appended in delta order. When an id repeats in the delta, the last row
+    wins. Rows missing a feature or leaving an integer column (e.g.
+    ``year``) empty are rejected; see ``incomplete_rows``.
+    """
+    delta = delta.drop_duplicates(subset=id_column, keep="last").reset_index(drop=True)
+    missing = [column for column in data.columns if column not in delta.columns]
+    if missing:
+        raise ValueError(f"Delta is missing columns: {', '.join(missing)}")
+    delta = delta[~incomplete_rows(data, delta)].reset_index(drop=True)
+    positions = pd.Index(data[id_column]).get_indexer(delta[id_column])
+    updated = positions >= 0
+    appended = np.arange(len(data), len(data) + int((~updated).sum()))
+    targets = positions.copy()
+    targets[~updated] = appended
+
+    columns = {}
+    for column in data.columns:
+        old = data[column].to_numpy()
+        new = delta[column].to_numpy()
+        if old.dtype == object:
+            new = np.array([None if pd.isna(value) else str(value) for value in new], dtype=object)
+        values = np.concatenate([old, new[~updated]])
+        if old.dtype != object:
+            # e.g. ints read as floats from a delta; an integer column widens if the delta needs it
+            dtype = np.promote_types(old.dtype, new.dtype) if new.dtype.kind in "iu" else old.dtype
+            values = values.astype(dtype, copy=False)
+        values[positions[updated]] = new[updated]
+        columns[column] = values
+    return pd.DataFrame(columns), np.sort(targets)
+
+
+def bootstrap_bundle(base_dir, data):
+    """Write a bundle from the legacy pickle so later ingestions can update it without a refit."""
+    model = joblib.load(Path(base_dir) / "data_model.pkl")
+    engine = RecommendationEngine.from_model(data, model)
+    save_bundle(Path(base_dir) / "data_model", engine.matrix, engine.feature_names, engine.scaler,
+                dataset_fingerprint(data, engine.feature_names))
+
+
+def ingest(base_dir, delta):
+    """Merge ``delta`` into the catalog, model bundle and ``data.csv`` under ``base_dir``.
+
+    Returns the new catalog manifest, plus the number of delta rows
+    ``merged`` and ``rejected`` by ``merge``. The bundle is written before
+    the catalog manifest, so processes never see a catalog revision whose
+    vectors are missing.
+    """
+    base_dir = Path(base_dir)
+    csv_path, catalog_dir = base_dir / "data" / "data.csv", base_dir / "data" / "catalog"
+    bundle_path = base_dir / "data_model"
+    data = load_catalog(csv_path, catalog_dir)
+    if not (bundle_path / "manifest.json").exists():
+        bootstrap_bundle(base_dir, data)
+    bundle = load_bundle(bundle_path, data)
+
+    merged, changed = merge(data, delta)
+    rejected = delta["id"].nunique() - len(changed)
+    delta_vectors = bundle.scaler.transform(merged.iloc[changed])
+    vectors = np.empty((len(merged), bundle.vectors.shape[1]), dtype=np.float32)
+    vectors[:len(data)] = bundle.vectors
+    vectors[changed] = delta_vectors
+
+    previous = read_manifest(catalog_dir)
+    revision = (previous.get("revision", 0) if previous else 0) + 1
+    old_vectors = bundle.manifest.get("vectors", VECTORS)
+    save_bundle(bundle_path, vectors, bundle.feature_names, bundle.scaler,
+                dataset_fingerprint(merged, bundle.feature_names), vectors_file=f"vectors.r{revision}.npy")
+
+    temporary = csv_path.with_suffix(".csv.tmp")
+    merged.to_csv(temporary, index=False, encoding="utf-8")
+    os.replace(temporary, csv_path)
+    manifest = write_revision(merged, catalog_dir, csv_path, changed)
+
+    # Keep the vectors the previous revision maps; drop anything older
+    for path in [bundle_path / VECTORS, *bundle_path.glob("vectors.r*.npy")]:
+        if path.name not in (old_vectors, f"vectors.r{revision}.npy"):
+            path.unlink(missing_ok=True)
+    return {**manifest, "merged": len(changed), "rejected": rejected}
+
+
+class Snapshot:
+    """One catalog revision and the indexes built over it. Never modified once published."""
+
+    def __init__(self, revision, data, search_index=None, column_index=None):
+        self.revision = revision
+        self.data = data
+        self.id_index = pd.Index(data["id"])
+        self._search_index = search_index
+        self._column_index = column_index
+        self._typeahead = None
+        self._lock = threading.Lock()
+
+    @property
+    def search_index(self):
+        """Trigram index, built on first use."""
+        if self._search_index is None:
+            with self._lock:
+                if self._search_index is None:
+                    self._search_index = SearchIndex.from_data(self.data)
+        return self._search_index
+
+    @property
+    def column_index(self):
+        if self._column_index is None:
+            with self._lock:
+                if self._column_index is None:
+                    self._column_index = ColumnIndex(self.data, FILTER_COLUMNS)
+        return self._column_index
+
+    @property
+    def typeahead(self):
+        """Seed picker index, built on first use (and rebuilt, not updated, for a new revision)."""
+        if self._typeahead is None:
+            with self._lock:
+                if self._typeahead is None:
+                    self._typeahead = Typeahead(self.data)
+        return self._typeahead
+
+    def updated(self, revision, data, changed):
+        """The next snapshot, updating only the indexes this one has already built."""
+        search_index = column_index = None
+        if self._search_index is not None:
+            search_index = self._search_index.updated(search_text(data), changed)
+        if self._column_index is not None:
+            column_index = self._column_index.updated(data, changed)
+        return Snapshot(revision, data, search_index, column_index)
+
+
+class LiveCatalog:
+    """The current ``Snapshot`` of a catalog directory, following new revisions."""
+
+    def __init__(self, base_dir, check_interval=CHECK_INTERVAL):
+        base_dir = Path(base_dir)
+        self.csv_path = base_dir / "data" / "data.csv"
+        self.catalog_dir = base_dir / "data" / "catalog"
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked = time.monotonic()
+        self._snapshot = self._load()
+
+    def _revision(self, manifest):
+        """Revision served from the binary copy, or ``None`` when the CSV was read instead."""
+        if not is_fresh(manifest, self.csv_path):
+            return None
+        return manifest.get("revision", 0)
+
+    def _load(self):
+        manifest = read_manifest(self.catalog_dir)
+        return Snapshot(self._revision(manifest), load_catalog(self.csv_path, self.catalog_dir))
+
+    def current(self):
+        """The latest snapshot; checks the manifest at most every ``check_interval`` seconds."""
+        now = time.monotonic()
+        if now - self._checked < self.check_interval or not self._lock.acquire(blocking=False):
+            return self._snapshot  # Someone else is checking or building the next one
+        try:
+            self._checked = now
+            manifest = read_manifest(self.catalog_dir)
+            revision = self._revision(manifest)
+            snapshot = self._snapshot
+            if revision == snapshot.revision:
+                return snapshot
+            if revision is not None and snapshot.revision is not None and manifest.get("parent") == snapshot.revision:
+                changed = np.load(self.catalog_dir / manifest["changed"])
+                data = load_catalog(self.csv_path, self.catalog_dir)
+                self._snapshot = snapshot.updated(revision, data, changed)
+            else:
+                self._snapshot = self._load()
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add or update catalog tracks without refitting the model.")
+    parser.add_argument("delta", help="CSV of new or changed tracks with the catalog's columns")
+    parser.add_argument("--dir", default=".", help="Repository root holding data/ and data_model/")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    # Ids stay strings, so ids made of digits keep their leading zeros
+    delta = pd.read_csv(args.delta, encoding="utf-8", dtype={"id": str})
+    manifest = ingest(args.dir, delta)
+    elapsed = time.perf_counter() - start
+    print(f"Revision {manifest['revision']}: {manifest['merged']:,} tracks merged, "
+          f"{manifest['rejected']:,} rejected for missing values, "
+          f"{manifest['rows']:,} rows in the catalog ({elapsed:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
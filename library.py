@@ -0,0 +1,151 @@
+"""Per-user favorites and playlists keyed by catalog ``id``.
+
+Each collection is an insertion-ordered set (a ``dict`` with no values),
+so add, remove and membership are O(1) however long it grows. Changes
+are queued and written to a SQLite file in batches; WAL mode lets many
+sessions write their own rows concurrently instead of rewriting one
+shared CSV. Exports are per user and only append rows added since the
+last export unless something was removed. User ids are the random hex
+strings ``new_user_id`` mints; anything else is rejected, since the id
+also names the user's export directory.
+"""
+import re
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+
+COLLECTIONS = ("favorites", "playlist")
+# Queued changes that trigger a write before the end of the rerun
+BATCH_SIZE = 256
+USER_ID = re.compile(r"[0-9a-f]{12}")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS library (
+    user TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    song_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (user, collection, song_id)
+)
+"""
+
+
+def new_user_id():
+    return uuid.uuid4().hex[:12]
+
+
+def valid_user_id(user):
+    """Whether ``user`` looks like an id from ``new_user_id`` (and so is safe as a path part)."""
+    return isinstance(user, str) and USER_ID.fullmatch(user) is not None
+
+
+class Collection:
+    """Ordered set of song ids backed by a ``LibraryStore``."""
+
+    def __init__(self, store, name, song_ids):
+        self.store = store
+        self.name = name
+        self._items = dict.fromkeys(song_ids)
+        self.needs_rewrite = False  # Set by removals: the next export rewrites instead of appending
+
+    def __contains__(self, song_id):
+        return song_id in self._items
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def add(self, song_id):
+        """Append ``song_id``; returns ``False`` if it was already there."""
+        if song_id in self._items:
+            return False
+        self._items[song_id] = None
+        self.store.queue("add", self.name, song_id)
+        return True
+
+    def remove(self, song_id):
+        """Remove ``song_id``; returns ``False`` if it was not there."""
+        if self._items.pop(song_id, False) is False:
+            return False
+        self.needs_rewrite = True
+        self.store.queue("remove", self.name, song_id)
+        return True
+
+
+class LibraryStore:
+    """One user's collections, persisted to a shared SQLite file."""
+
+    def __init__(self, path, user, export_dir="exports"):
+        if not valid_user_id(user):
+            raise ValueError(f"Invalid user id {user!r}")
+        self.user = user
+        self.export_dir = Path(export_dir) / user
+        self._lock = threading.Lock()
+        self._pending = []
+        self._exported = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        rows = self._conn.execute(
+            "SELECT collection, song_id, seq FROM library WHERE user = ? ORDER BY seq", (user,)
+        ).fetchall()
+        self._seq = max((seq for _, _, seq in rows), default=0)
+        self.collections = {
+            name: Collection(self, name, [song_id for collection, song_id, _ in rows if collection == name])
+            for name in COLLECTIONS
+        }
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+    def queue(self, op, collection, song_id):
+        with self._lock:
+            self._seq += 1
+            self._pending.append((op, collection, song_id, self._seq))
+            full = len(self._pending) >= BATCH_SIZE
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write all queued changes in one transaction."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            with self._conn:
+                for op, collection, song_id, seq in pending:
+                    if op == "add":
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO library (user, collection, song_id, seq) VALUES (?, ?, ?, ?)",
+                            (self.user, collection, song_id, seq),
+                        )
+                    else:
+                        self._conn.execute(
+                            "DELETE FROM library WHERE user = ? AND collection = ? AND song_id = ?",
+                            (self.user, collection, song_id),
+                        )
+
+    def export_csv(self, name, resolve):
+        """Write ``name`` to this user's CSV, appending only what is new; returns the path.
+
+        ``resolve`` maps a list of song ids to a frame of the columns to export.
+        """
+        collection = self.collections[name]
+        song_ids = list(collection)
+        path = self.export_dir / f"{name}.csv"
+        exported = self._exported.get(name)
+        self.flush()
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        if exported is None or collection.needs_rewrite or not path.exists():
+            resolve(song_ids).to_csv(path, index=False)
+        elif exported < len(song_ids):
+            resolve(song_ids[exported:]).to_csv(path, mode="a", header=False, index=False)
+        collection.needs_rewrite = False
+        self._exported[name] = len(song_ids)
+        return path
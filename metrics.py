@@ -0,0 +1,308 @@
+"""Per-stage timings, cache hit rates and a sampling profiler for slow reruns.
+
+Every Streamlit interaction reruns ``Music.py`` top to bottom, so the
+interesting question is which stage of a rerun (loading, inference,
+search, filtering, charts, cards) the time goes to. Stages are timed
+with ``METRICS.stage(name)`` (or ``METRICS.start(name)`` for a region
+that is not one block) into a process-wide ``Metrics`` registry holding,
+per stage, a latency histogram with fixed buckets, the call count and
+the catalog rows processed. Caches register a ``stats()`` callable with
+``watch_cache`` and their hit rates are read when the metrics are.
+
+The registry can be read as Prometheus text (``prometheus``), as a JSON
+dict (``snapshot``/``dump``) or over HTTP with ``serve``. With
+``AMUSIC_PROFILE_DIR`` set, ``SlowRerunProfiler`` samples the stack of
+every rerun and keeps collapsed stacks (flame graph input) of the
+slowest few on disk.
+"""
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Seconds between stack samples of the profiled thread
+SAMPLE_INTERVAL = 0.005
+# Slowest reruns kept on disk by the profiler
+KEEP_PROFILES = 5
+PROFILE_NAME = re.compile(r"(\d+)ms-.*\.folded$")
+
+
+class Histogram:
+    """Per-bucket counts, sum, max and rows processed of one stage's latencies."""
+
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last bucket is +Inf
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+
+    def observe(self, ms, rows=None):
+        index = 0
+        while index < len(self.buckets) and ms > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        if rows is not None:
+            self.rows += int(rows)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile (the max for the last bucket)."""
+        if not self.count:
+            return 0.0
+        target, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return float(min(bound, self.max_ms))
+        return self.max_ms
+
+
+class Timing:
+    """A running measurement of one stage; ``stop`` records it."""
+
+    def __init__(self, metrics, name, rows=None):
+        self.metrics = metrics
+        self.name = name
+        self.rows = rows
+        self.started = time.perf_counter()
+
+    def stop(self, rows=None):
+        """Record the elapsed milliseconds (and ``rows``, if given) and return them."""
+        ms = (time.perf_counter() - self.started) * 1000
+        self.metrics.observe(self.name, ms, self.rows if rows is None else rows)
+        return ms
+
+
+class Metrics:
+    """Thread-safe registry of stage histograms and watched caches."""
+
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.stages = {}
+        self.caches = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def observe(self, name, ms, rows=None):
+        with self._lock:
+            histogram = self.stages.get(name)
+            if histogram is None:
+                histogram = self.stages[name] = Histogram(self.buckets)
+            histogram.observe(ms, rows)
+
+    def start(self, name, rows=None):
+        return Timing(self, name, rows)
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Time the block as ``name``; set ``.rows`` on the yielded timing once the count is known."""
+        timing = self.start(name, rows)
+        try:
+            yield timing
+        finally:
+            timing.stop()
+
+    def timed(self, name, rows=None):
+        """Decorator timing every call of a function as ``name``."""
+        def decorate(function):
+            # ``wraps`` keeps the name and source that ``st.cache_resource`` keys its cache on
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name, rows):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def watch_cache(self, name, stats):
+        """Report ``stats()`` (a dict with ``hits`` and ``misses``) as cache ``name``."""
+        self.caches[name] = stats
+
+    def cache_stats(self):
+        found = {}
+        for name, stats in list(self.caches.items()):
+            values = stats()
+            if values is not None:
+                lookups = values["hits"] + values["misses"]
+                found[name] = {"hit_rate": values["hits"] / lookups if lookups else 0.0, **values}
+        return found
+
+    def snapshot(self):
+        """Plain dict of every stage and cache, for JSON."""
+        with self._lock:
+            stages = {
+                name: {
+                    "count": h.count,
+                    "mean_ms": h.sum_ms / h.count,
+                    "p50_ms": h.quantile(0.5),
+                    "p95_ms": h.quantile(0.95),
+                    "max_ms": h.max_ms,
+                    "total_ms": h.sum_ms,
+                    "rows": h.rows,
+                }
+                for name, h in sorted(self.stages.items())
+            }
+        return {"uptime_s": time.time() - self.started, "stages": stages, "caches": self.cache_stats()}
+
+    def dump(self, path):
+        """Write ``snapshot`` to ``path`` as JSON, replacing it atomically."""
+        path = Path(path)
+        temp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temp.write_text(json.dumps(self.snapshot(), indent=2), encoding="utf-8")
+        os.replace(temp, path)
+
+    def prometheus(self, prefix="amusic"):
+        """Prometheus text exposition of the stage histograms, row counters and caches."""
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent in each stage.",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        with self._lock:
+            stages = sorted((name, list(h.counts), h.count, h.sum_ms, h.rows) for name, h in self.stages.items())
+        for name, counts, count, sum_ms, _ in stages:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound / 1000:g}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {count}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {sum_ms / 1000:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {count}')
+        lines += [f"# HELP {prefix}_stage_rows_total Catalog rows processed by each stage.",
+                  f"# TYPE {prefix}_stage_rows_total counter"]
+        lines += [f'{prefix}_stage_rows_total{{stage="{name}"}} {rows}' for name, _, _, _, rows in stages if rows]
+        caches = self.cache_stats()
+        for metric, kind in (("hits", "counter"), ("misses", "counter"), ("entries", "gauge")):
+            name = f"{prefix}_cache_{metric}" + ("_total" if kind == "counter" else "")
+            lines += [f"# TYPE {name} {kind}"]
+            lines += [f'{name}{{cache="{cache}"}} {stats[metric]}'
+                      for cache, stats in caches.items() if metric in stats]
+        return "\n".join(lines) + "\n"
+
+
+# The registry shared by everything in this process
+METRICS = Metrics()
+
+
+def serve(metrics=METRICS, port=9100, host="127.0.0.1"):
+    """Serve ``/metrics`` (Prometheus text) and ``/metrics.json`` from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") == "/metrics":
+                body, content_type = metrics.prometheus(), "text/plain; version=0.0.4"
+            elif self.path.rstrip("/") == "/metrics.json":
+                body, content_type = json.dumps(metrics.snapshot()), "application/json"
+            else:
+                self.send_error(404)
+                return
+            payload = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+class Sampler:
+    """Collects the stack of one thread every ``interval`` seconds until stopped."""
+
+    def __init__(self, profiler, thread_id):
+        self.profiler = profiler
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.started = time.perf_counter()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rerun-sampler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._done.wait(self.profiler.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break  # The run ended without ``stop`` (``st.stop`` or ``st.rerun``)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def cancel(self):
+        self._done.set()
+
+    def stop(self, label="rerun"):
+        """Stop sampling; returns the profile written to disk, if this was one of the slowest runs."""
+        ms = (time.perf_counter() - self.started) * 1000
+        self._done.set()
+        self._thread.join()
+        return self.profiler.record(self, ms, label)
+
+
+class SlowRerunProfiler:
+    """Keeps collapsed-stack samples of the ``keep`` slowest runs in ``out_dir``.
+
+    Each file is named ``<milliseconds>ms-<label>-<time>.folded`` and holds
+    one ``frame;frame;frame count`` line per distinct stack, the input
+    format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, out_dir, keep=KEEP_PROFILES, interval=SAMPLE_INTERVAL):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.keep = keep
+        self.interval = interval
+        self._lock = threading.Lock()
+        self.active = {}  # Thread id -> its running sampler
+        # (milliseconds, path) of the profiles on disk, slowest first
+        matches = ((PROFILE_NAME.match(path.name), path) for path in self.out_dir.glob("*.folded"))
+        self.kept = sorted(((float(match.group(1)), path) for match, path in matches if match), reverse=True)
+
+    def start(self):
+        """Start sampling the calling thread, dropping a run of it that never stopped."""
+        thread_id = threading.get_ident()
+        with self._lock:
+            if thread_id in self.active:
+                self.active[thread_id].cancel()
+            # Samplers whose thread ended on its own have nothing left to record
+            self.active = {key: running for key, running in self.active.items() if running.is_alive()}
+            sampler = self.active[thread_id] = Sampler(self, thread_id)
+        return sampler
+
+    def record(self, sampler, ms, label):
+        stacks = sampler.stacks
+        with self._lock:
+            if self.active.get(sampler.thread_id) is sampler:
+                del self.active[sampler.thread_id]
+            if not stacks or (len(self.kept) >= self.keep and ms <= self.kept[-1][0]):
+                return None
+            label = re.sub(r"[^A-Za-z0-9_-]+", "_", label).strip("_") or "rerun"
+            path = self.out_dir / f"{ms:.0f}ms-{label}-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+            path.write_text("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()), encoding="utf-8")
+            self.kept.append((ms, path))
+            self.kept.sort(reverse=True)
+            for _, old in self.kept[self.keep:]:
+                old.unlink(missing_ok=True)
+            del self.kept[self.keep:]
+            return path
@@ -0,0 +1,101 @@
+"""Versioned model bundle: a JSON manifest plus memory-mappable float32 vectors.
+
+A pickled ``NearestNeighbors`` duplicates the whole training matrix, has
+no version check and forgets the ``MinMaxScaler`` the notebook fitted. A
+bundle is a directory holding:
+
+* ``manifest.json`` - schema version, feature order, the fitted
+  ``preprocessing.FeatureScaler`` and a fingerprint of the catalog rows it
+  was built from;
+* ``vectors.npy`` - the scaled features, L2-normalized, as float32 rows
+  aligned with the catalog, loaded with ``mmap_mode="r"``.
+
+``load_bundle`` raises ``StaleBundleError`` when the schema version or the
+catalog fingerprint does not match, instead of serving wrong neighbours.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from preprocessing import FeatureScaler
+from recommender import normalize_rows
+
+BUNDLE_VERSION = 1
+MANIFEST = "manifest.json"
+VECTORS = "vectors.npy"
+
+
+class StaleBundleError(ValueError):
+    """The bundle was written for another schema version or another catalog."""
+
+
+def dataset_fingerprint(data, feature_names):
+    """Hash of the catalog's row order (``id``) and raw feature values.
+
+    Features are hashed as float32 so the fingerprint does not depend on
+    whether the catalog was loaded as float64 or float32.
+    """
+    digest = hashlib.sha256()
+    features = np.ascontiguousarray(data[list(feature_names)].to_numpy(dtype=np.float32))
+    digest.update(features.tobytes())
+    if "id" in data.columns:
+        digest.update("\n".join(data["id"].astype(str)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ModelBundle:
+    """Scaler parameters, feature order and normalized vectors of one fitted model."""
+
+    def __init__(self, manifest, vectors):
+        self.manifest = manifest
+        self.feature_names = list(manifest["feature_names"])
+        self.scaler = FeatureScaler.from_dict(manifest["scaler"], self.feature_names)
+        self.vectors = vectors
+
+    def __len__(self):
+        return len(self.vectors)
+
+
+def save_bundle(path, features, feature_names, scaler, fingerprint, vectors_file=VECTORS):
+    """Write a bundle for ``features`` (already scaled, one row per catalog song).
+
+    ``scaler`` is a ``preprocessing.FeatureScaler`` or a fitted sklearn
+    ``MinMaxScaler``. Writing the vectors under a new ``vectors_file`` name
+    leaves the previous file intact for processes that still map it.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    np.save(path / vectors_file, normalize_rows(features))
+    manifest = {
+        "schema_version": BUNDLE_VERSION,
+        "metric": "cosine",
+        "rows": int(len(features)),
+        "feature_names": list(feature_names),
+        "scaler": {"min": np.asarray(scaler.min_).tolist(), "scale": np.asarray(scaler.scale_).tolist()},
+        "dataset_sha256": fingerprint,
+        "vectors": vectors_file,
+    }
+    # The manifest goes last, renamed into place, so a half-written bundle never loads
+    temporary = path / f"{MANIFEST}.tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2)
+    os.replace(temporary, path / MANIFEST)
+    return manifest
+
+
+def load_bundle(path, data=None):
+    """Load a bundle, memory-mapping its vectors; checked against ``data`` when given."""
+    path = Path(path)
+    with open(path / MANIFEST, encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    if manifest.get("schema_version") != BUNDLE_VERSION:
+        raise StaleBundleError(
+            f"Bundle schema version {manifest.get('schema_version')} is not {BUNDLE_VERSION}; rebuild it"
+        )
+    if data is not None:
+        if len(data) != manifest["rows"] or dataset_fingerprint(data, manifest["feature_names"]) != manifest["dataset_sha256"]:
+            raise StaleBundleError("Bundle was built from a different catalog; rebuild it from the notebook")
+    return ModelBundle(manifest, np.load(path / manifest.get("vectors", VECTORS), mmap_mode="r"))
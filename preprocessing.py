@@ -0,0 +1,118 @@
+"""Feature scaling shared by the notebook (training) and the app (serving).
+
+The notebook min-max scales the eight audio features before fitting
+``NearestNeighbors``; querying with raw values lets ``tempo`` (0-240)
+dominate the cosine distance. ``FeatureScaler`` is fitted once, saved in
+the model bundle and applied to the whole catalog at load time, so
+queries against the normalized matrix need no per-request transformation.
+
+Check that served neighbours match the notebook's ``evaluate_model_cosine``
+(``tests/test_preprocessing.py`` does this on a synthetic catalog):
+
+    python preprocessing.py --data data/data.csv --bundle data_model
+"""
+import argparse
+import sys
+
+import numpy as np
+
+FEATURES = ["danceability", "energy", "valence", "tempo", "acousticness", "instrumentalness", "liveness", "speechiness"]
+
+
+class FeatureScaler:
+    """Min-max scaling to [0, 1], numerically identical to sklearn's ``MinMaxScaler()``."""
+
+    def __init__(self, feature_names, min_, scale_):
+        self.feature_names = list(feature_names)
+        self.min_ = np.asarray(min_, dtype=np.float64)
+        self.scale_ = np.asarray(scale_, dtype=np.float64)
+
+    @classmethod
+    def fit(cls, data, feature_names=FEATURES):
+        values = data[list(feature_names)].to_numpy(dtype=np.float64)
+        data_min, data_max = np.nanmin(values, axis=0), np.nanmax(values, axis=0)
+        data_range = data_max - data_min
+        data_range[data_range == 0] = 1.0  # Constant features map to 0, as in sklearn
+        scale = 1.0 / data_range
+        return cls(feature_names, -data_min * scale, scale)
+
+    @classmethod
+    def from_sklearn(cls, scaler, feature_names=FEATURES):
+        return cls(feature_names, scaler.min_, scaler.scale_)
+
+    @classmethod
+    def from_dict(cls, params, feature_names):
+        return cls(feature_names, params["min"], params["scale"])
+
+    def to_dict(self):
+        return {"min": self.min_.tolist(), "scale": self.scale_.tolist()}
+
+    def transform(self, features):
+        """Scale raw features: a catalog frame (columns picked by name) or an array in feature order."""
+        if hasattr(features, "columns"):
+            features = features[self.feature_names].to_numpy(dtype=np.float64)
+        return np.asarray(features, dtype=np.float64) * self.scale_ + self.min_
+
+
+def check_against_notebook(data, engine, rows, top_n=5):
+    """Compare served neighbours with the notebook's scaling + ``NearestNeighbors`` path.
+
+    Returns ``(neighbour_agreement, notebook_similarity, served_similarity)``
+    over ``rows``; the similarities are ``evaluate_model_cosine``'s mean
+    cosine similarity between each song and its recommendations.
+    """
+    import pandas as pd
+    from sklearn.metrics.pairwise import cosine_similarity
+    from sklearn.neighbors import NearestNeighbors
+    from sklearn.preprocessing import MinMaxScaler
+
+    # The notebook's training cells, verbatim in spirit
+    df = data.copy()
+    df[FEATURES] = MinMaxScaler().fit_transform(df[FEATURES])
+    model = NearestNeighbors(n_neighbors=top_n + 1, metric="cosine").fit(df[FEATURES])
+
+    agreement, notebook_scores, served_scores = [], [], []
+    for row in rows:
+        query_point = pd.DataFrame([df.iloc[row][FEATURES]], columns=FEATURES)
+        _, indices = model.kneighbors(query_point, n_neighbors=top_n + 1)
+        expected = indices[0][indices[0] != row][:top_n]
+        notebook_scores.append(np.mean(cosine_similarity(query_point, df.iloc[expected][FEATURES].values)))
+
+        served, scores = engine.recommend(row, top_n + 1)
+        keep = served != row
+        served, scores = served[keep][:top_n], scores[keep][:top_n]
+        served_scores.append(np.mean(scores))
+        agreement.append(len(np.intersect1d(served, expected)) / top_n)
+    return float(np.mean(agreement)), float(np.mean(notebook_scores)), float(np.mean(served_scores))
+
+
+def main():
+    import pandas as pd
+
+    from recommender import RecommendationEngine
+
+    parser = argparse.ArgumentParser(description="Check served neighbours against the notebook's evaluation.")
+    parser.add_argument("--data", default="data/data.csv")
+    parser.add_argument("--bundle", default=None, help="Model bundle to check (default: scale the catalog here)")
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--top-n", type=int, default=5)
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data, encoding="utf-8").dropna(subset=FEATURES).reset_index(drop=True)
+    if args.bundle:
+        from model_bundle import load_bundle
+
+        engine = RecommendationEngine.from_bundle(load_bundle(args.bundle, data), data)
+    else:
+        engine = RecommendationEngine.from_catalog(data, FeatureScaler.fit(data))
+
+    rows = np.random.default_rng(0).choice(len(data), size=min(args.rows, len(data)), replace=False)
+    agreement, notebook, served = check_against_notebook(data, engine, rows, args.top_n)
+    print(f"Neighbour agreement: {agreement:.4f}")
+    print(f"Mean cosine similarity: notebook {notebook:.4f}, served {served:.4f}")
+    if agreement < 0.99 or abs(notebook - served) > 1e-4:
+        sys.exit("Served recommendations do not match the notebook's evaluation")
+
+
+if __name__ == "__main__":
+    main()
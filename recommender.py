@@ -0,0 +1,280 @@
+"""Vectorized cosine top-k engine over the song feature matrix.
+
+The catalog features are L2-normalized once into a contiguous float32
+matrix, so a cosine query is a single matrix-vector product followed by
+``argpartition`` instead of a brute-force ``kneighbors`` scan that
+re-normalizes the whole catalog on every click.
+"""
+import numpy as np
+import pandas as pd
+
+from preprocessing import FeatureScaler
+
+# Upper bound on the similarity block materialized by batched queries
+BLOCK_BYTES = 64 * 1024 * 1024
+# Candidate pool per requested recommendation when re-ranking for diversity
+POOL_FACTOR = 5
+# Filters keeping more than this share of the catalog are applied after the search
+PREFILTER_SELECTIVITY = 0.2
+# Margin on the expected number of neighbours to fetch before post-filtering
+OVERFETCH = 2.0
+
+
+def normalize_rows(matrix):
+    """Return a C-contiguous float32 copy of ``matrix`` with unit-length rows."""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0  # All-zero rows stay zero instead of becoming NaN
+    return np.ascontiguousarray(matrix / norms)
+
+
+def top_k_indices(scores, k):
+    """Indices of the ``k`` highest ``scores``, best first."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < scores.shape[-1]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[-1])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def top_k_rows(scores, k):
+    """Row-wise ``top_k_indices`` for a 2-D block of scores."""
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    picked = np.take_along_axis(scores, candidates, axis=1)
+    return np.take_along_axis(candidates, np.argsort(-picked, axis=1, kind="stable"), axis=1)
+
+
+def mmr_rerank(relevance, pairwise, top_n, diversity):
+    """Maximal Marginal Relevance selection over a candidate pool.
+
+    ``relevance`` holds each candidate's similarity to the seed, shape
+    ``(pool,)`` or ``(seeds, pool)``, and ``pairwise`` the similarities among
+    candidates, ``(pool, pool)`` or ``(seeds, pool, pool)``. Each pick
+    maximizes ``(1 - diversity) * relevance - diversity * redundancy``, where
+    redundancy is the highest similarity to anything already picked and is
+    updated incrementally, so a pick costs O(pool). Candidates with
+    non-finite relevance (rows excluded upstream) are only picked once no
+    other candidate is left. Returns positions into the pool in pick order,
+    with the same leading shape as ``relevance``.
+    """
+    single = relevance.ndim == 1
+    relevance = np.atleast_2d(relevance)
+    excluded = ~np.isfinite(relevance)
+    relevance = np.where(excluded, 0.0, relevance)  # At diversity 1, 0 * -inf would be NaN and win the argmax
+    pairwise = pairwise.reshape(relevance.shape + relevance.shape[-1:])
+    seeds, pool = relevance.shape
+    top_n = min(top_n, pool)
+    rows = np.arange(seeds)
+
+    picks = np.empty((seeds, top_n), dtype=np.intp)
+    available = np.ones((seeds, pool), dtype=bool)
+    eligible = ~excluded
+    any_excluded = bool(excluded.any())
+    redundancy = None
+    for i in range(top_n):
+        if redundancy is None:
+            scores = relevance
+        else:
+            scores = (1.0 - diversity) * relevance - diversity * redundancy
+        pick = np.where(eligible, scores, -np.inf).argmax(axis=1)
+        if any_excluded:
+            # Once only excluded candidates are left, take them in pool order instead of repeating a pick
+            exhausted = ~eligible[rows, pick]
+            pick[exhausted] = available[exhausted].argmax(axis=1)
+            available[rows, pick] = False
+        picks[:, i] = pick
+        eligible[rows, pick] = False
+        similarity = pairwise[rows, pick]
+        redundancy = similarity if redundancy is None else np.maximum(redundancy, similarity)
+    return picks[0] if single else picks
+
+
+def filtered_recommendations(engine, row, top_n, column_index, ranges, exclude=None):
+    """Top ``top_n`` rows for seed ``row`` among rows matching every ``column: (low, high)``.
+
+    Works with any engine exposing ``recommend`` and ``seed_similarities``,
+    and a ``column_index.ColumnIndex`` over the filtered columns. Selective
+    filters are applied first and only the allowed rows are scored. Loose
+    ones over-fetch about ``top_n / selectivity`` neighbours and filter
+    those; if too few survive (a seed's neighbourhood can match far less
+    often than the catalog does), the allowed rows are scored after all.
+    Either way ``top_n`` rows come back whenever that many match. The seed
+    and rows in ``exclude`` are never returned. Returns ``(indices, similarities)``.
+    """
+    skip = np.append(np.asarray([] if exclude is None else exclude, dtype=np.intp), row)
+    selectivity = column_index.selectivity(ranges)
+    if selectivity > PREFILTER_SELECTIVITY:
+        pool = min(len(engine), int(np.ceil(top_n / selectivity * OVERFETCH)) + len(skip))
+        indices, scores = engine.recommend(row, pool)
+        keep = column_index.matches(ranges, indices) & ~np.isin(indices, skip)
+        if keep.sum() >= top_n:
+            return indices[keep][:top_n], scores[keep][:top_n]
+    allowed = column_index.filter(ranges)
+    allowed = allowed[~np.isin(allowed, skip)]
+    scores = engine.seed_similarities(row, allowed)
+    best = top_k_indices(scores, top_n)
+    return allowed[best], scores[best]
+
+
+def diverse_recommendations(engine, row, top_n, diversity, exclude=None, column_index=None, ranges=None):
+    """Top ``top_n`` rows for seed ``row`` re-ranked with MMR.
+
+    Works with any engine exposing ``recommend`` and ``vectors_for``. The seed
+    and any rows in ``exclude`` are dropped from the candidate pool of
+    ``top_n * POOL_FACTOR`` nearest neighbours, which is drawn from rows
+    matching ``ranges`` when given (see ``filtered_recommendations``).
+    Returns ``(indices, similarities)``.
+    """
+    pool = top_n * POOL_FACTOR
+    if ranges:
+        indices, scores = filtered_recommendations(engine, row, pool, column_index, ranges, exclude)
+    else:
+        skip = {row} if exclude is None else {row, *np.asarray(exclude).tolist()}
+        indices, scores = engine.recommend(row, pool + len(skip))
+        keep = ~np.isin(indices, list(skip))
+        indices, scores = indices[keep][:pool], scores[keep][:pool]
+    vectors = engine.vectors_for(indices)
+    picks = mmr_rerank(scores, vectors @ vectors.T, top_n, diversity)
+    return indices[picks], scores[picks]
+
+
+def catalog_ids(data, id_column="id"):
+    """The column that identifies rows of ``data`` for batch queries, if present."""
+    return data[id_column] if id_column in data.columns else None
+
+
+class RecommendationEngine:
+    """Exact cosine nearest neighbours over a pre-normalized feature matrix."""
+
+    def __init__(self, features, feature_names, ids=None, normalized=False, scaler=None):
+        self.feature_names = list(feature_names)
+        # Already-normalized rows (e.g. a memory-mapped bundle) are used without a copy
+        self.matrix = features if normalized else normalize_rows(features)
+        self.ids = None if ids is None else pd.Index(ids)
+        self.scaler = scaler
+
+    @classmethod
+    def from_catalog(cls, data, scaler, id_column="id"):
+        """Scale the whole catalog in one pass with the fitted ``scaler``."""
+        return cls(scaler.transform(data), scaler.feature_names, catalog_ids(data, id_column), scaler=scaler)
+
+    @classmethod
+    def from_model(cls, data, model, id_column="id"):
+        """Build the engine over the same matrix the fitted ``NearestNeighbors`` searches.
+
+        The notebook fits on scaled features, so the model's own training
+        matrix is preferred. When the model does not line up with ``data``
+        row for row, the catalog is scaled the way the notebook does it
+        rather than searched in raw units.
+        """
+        scaler = FeatureScaler.fit(data, list(model.feature_names_in_))
+        fitted = getattr(model, "_fit_X", None)
+        if fitted is not None and len(fitted) == len(data):
+            return cls(fitted, scaler.feature_names, catalog_ids(data, id_column), scaler=scaler)
+        return cls.from_catalog(data, scaler, id_column)
+
+    @classmethod
+    def from_bundle(cls, bundle, data, id_column="id"):
+        """Serve straight from a ``model_bundle.ModelBundle``'s normalized vectors."""
+        return cls(bundle.vectors, bundle.feature_names, catalog_ids(data, id_column),
+                   normalized=True, scaler=bundle.scaler)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def vectors_for(self, rows):
+        """Unit feature vectors of catalog ``rows``."""
+        return self.matrix[rows]
+
+    def similarities(self, vector):
+        """Cosine similarity of ``vector`` (already unit length) against every row."""
+        return self.matrix @ vector
+
+    def seed_similarities(self, row, rows):
+        """Cosine similarity of catalog ``rows`` to seed ``row``."""
+        return self.matrix[rows] @ self.matrix[row]
+
+    def query(self, vector, k):
+        """Top-k rows for an arbitrary raw feature vector as ``(indices, similarities)``."""
+        if self.scaler is not None:
+            vector = self.scaler.transform(vector)
+        vector = normalize_rows(np.asarray(vector).reshape(1, -1))[0]
+        scores = self.similarities(vector)
+        indices = top_k_indices(scores, k)
+        return indices, scores[indices]
+
+    def recommend(self, row, k):
+        """Top-k rows for catalog row ``row``, the same neighbours ``kneighbors`` returns.
+
+        Like ``kneighbors`` on a training point, the seed itself is normally the
+        first result.
+        """
+        scores = self.similarities(self.matrix[row])
+        indices = top_k_indices(scores, k)
+        return indices, scores[indices]
+
+    def recommend_vectors(self, vectors, k, exclude=None):
+        """Top-k rows closest to any of several unit ``vectors``, skipping rows in ``exclude``.
+
+        All vectors are scored in one matrix product; each row keeps its best
+        similarity to any of them. Returns ``(indices, similarities)``.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.matrix.shape[1])
+        scores = (self.matrix @ vectors.T).max(axis=1)
+        if exclude is not None:
+            scores[np.asarray(exclude, dtype=np.intp)] = -np.inf
+        indices = top_k_indices(scores, k)
+        indices = indices[np.isfinite(scores[indices])]
+        return indices, scores[indices]
+
+    def rows_for(self, song_ids):
+        """Catalog rows of ``song_ids``; unknown ids raise ``KeyError``."""
+        if self.ids is None:
+            raise ValueError("Engine was built without song ids")
+        rows = self.ids.get_indexer(song_ids)
+        if (rows < 0).any():
+            missing = np.asarray(song_ids)[rows < 0]
+            raise KeyError(f"Unknown song ids: {', '.join(map(str, missing[:5]))}")
+        return rows
+
+    def recommend_rows(self, rows, k, block_size=None):
+        """Top-k neighbours of many catalog rows, excluding each seed itself.
+
+        Seeds are processed in blocks so the similarity matrix held at once
+        stays under ``BLOCK_BYTES``. Yields ``(rows, indices, similarities)``
+        per block.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        block_size = block_size or max(1, BLOCK_BYTES // (4 * len(self)))
+        for start in range(0, len(rows), block_size):
+            seeds = rows[start:start + block_size]
+            scores = self.matrix[seeds] @ self.matrix.T
+            scores[np.arange(len(seeds)), seeds] = -np.inf
+            indices = top_k_rows(scores, k)
+            yield seeds, indices, np.take_along_axis(scores, indices, axis=1)
+
+    def recommend_batch(self, song_ids, top_n, diversity=0.0, block_size=None):
+        """Recommendations for many seed songs, streamed one block of seeds at a time.
+
+        Yields ``(seed_ids, song_ids, similarities)`` arrays of shape
+        ``(block,)``, ``(block, top_n)`` and ``(block, top_n)``. With a
+        non-zero ``diversity`` each seed's ``top_n * POOL_FACTOR`` nearest
+        candidates are re-ranked with ``mmr_rerank`` for the whole block at once.
+        """
+        pool = top_n * POOL_FACTOR if diversity > 0 else top_n
+        ids = self.ids.to_numpy()
+        for seeds, indices, scores in self.recommend_rows(self.rows_for(song_ids), pool, block_size):
+            if diversity > 0:
+                vectors = self.matrix[indices]
+                pairwise = np.einsum("spd,sqd->spq", vectors, vectors)
+                picks = mmr_rerank(scores, pairwise, top_n, diversity)
+                indices = np.take_along_axis(indices, picks, axis=1)
+                scores = np.take_along_axis(scores, picks, axis=1)
+            yield ids[seeds], ids[indices], scores
@@ -0,0 +1,154 @@
+"""Process-wide cache of recommendation and search results.
+
+Chart hits get asked for over and over, so results are memoized under
+a key such as ``("recommend", seed, top_n, diversity)`` in a bounded LRU
+whose entries also expire after ``ttl`` seconds. Every cache belongs to
+one ``version`` (see ``cache_version``): a new catalog, model bundle,
+approximate index or ``nprobe`` gets a fresh cache, so stale results are
+never served.
+
+With ``disk_dir`` set, entries are also pickled to
+``<disk_dir>/<version>/`` and reloaded on a memory miss, so warm results
+survive restarts. Only results computed by this app are ever read back.
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+MAX_ENTRIES = 2048
+TTL = 3600
+
+
+def cache_version(*parts):
+    """Short hash identifying what results depend on (catalog fingerprint, model, index type)."""
+    return hashlib.sha256(json.dumps([str(part) for part in parts]).encode("utf-8")).hexdigest()[:16]
+
+
+def model_version(model, model_path=None):
+    """What identifies a loaded model: a bundle's manifest, else the pickle's size and mtime."""
+    manifest = getattr(model, "manifest", None)
+    if manifest is not None:
+        return cache_version(json.dumps(manifest, sort_keys=True))
+    if model_path is not None and os.path.exists(model_path):
+        stat = os.stat(model_path)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+    return type(model).__name__
+
+
+def index_version(index_path=None, nprobe=None):
+    """What identifies the search index: ``"exact"``, or the IVF-PQ file's size and mtime and ``nprobe``."""
+    if index_path is None or not os.path.exists(index_path):
+        return "exact"
+    stat = os.stat(index_path)
+    return f"ivfpq:{stat.st_size}:{stat.st_mtime_ns}:{nprobe}"
+
+
+class ResultCache:
+    """Thread-safe LRU with a TTL, hit/miss counters and an optional disk tier."""
+
+    def __init__(self, version, max_entries=MAX_ENTRIES, ttl=TTL, disk_dir=None):
+        self.version = version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = Path(disk_dir) / version if disk_dir else None
+        self._entries = OrderedDict()  # key -> (expires, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, key):
+        return self.disk_dir / (hashlib.sha256(repr(key).encode("utf-8")).hexdigest() + ".pkl")
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+        value = self._load(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.disk_hits += 1
+            self._store(key, value, now)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value, time.monotonic())
+        self._save(key, value)
+
+    def get_or_compute(self, key, compute):
+        """Cached value of ``key``, calling ``compute()`` and storing the result on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def _store(self, key, value, now):
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _load(self, key):
+        if self.disk_dir is None:
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+                return None
+            with open(path, "rb") as handle:
+                stored_key, value = pickle.load(handle)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return value if stored_key == key else None
+
+    def _save(self, key, value):
+        if self.disk_dir is None:
+            return
+        path = self._path(key)
+        try:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            temporary = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(temporary, "wb") as handle:
+                pickle.dump((key, value), handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, path)  # Readers never see a half-written entry
+        except OSError:
+            pass  # The disk tier is best effort
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
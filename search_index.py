@@ -0,0 +1,102 @@
+"""Character-trigram inverted index for the Advanced Search tab.
+
+``process.extract`` runs a Python-level fuzzy scorer over every
+"name - artists" string in the catalog for each query. This index keeps
+the normalized strings and a trigram posting list built once per dataset
+load; a query counts shared trigrams for every row with one ``bincount``,
+then runs the same fuzzy scorer only on the best few hundred candidates.
+``updated`` re-indexes only the rows an ingestion added or changed.
+"""
+import numpy as np
+import pandas as pd
+from fuzzywuzzy import process
+from fuzzywuzzy.utils import full_process
+
+# Same cut-offs the Advanced Search tab has always used
+MIN_SCORE = 60
+LIMIT = 20
+CANDIDATES = 300
+
+
+def trigrams(text):
+    """Distinct character trigrams of an already normalized string, space padded."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def search_text(data):
+    """The "name - artists" string every catalog row is searched by."""
+    return data["name"].astype("str") + " - " + data["artists"].astype("str")
+
+
+class SearchIndex:
+    """Trigram candidate generation followed by exact fuzzy scoring."""
+
+    def __init__(self, choices):
+        self.choices = pd.Series(choices).fillna("").reset_index(drop=True)
+        self.vocabulary = {}
+        gram_ids, rows = self._postings(np.arange(len(self.choices)))
+        self._set_postings(gram_ids, rows)
+
+    def _postings(self, rows):
+        """``(trigram ids, rows)`` pairs for ``rows``, growing the vocabulary as needed."""
+        gram_ids, counts = [], []
+        for text in self.choices.iloc[rows].map(full_process):
+            ids = {self.vocabulary.setdefault(gram, len(self.vocabulary)) for gram in trigrams(text)}
+            gram_ids.extend(ids)
+            counts.append(len(ids))
+        return np.asarray(gram_ids, dtype=np.int32), np.repeat(np.asarray(rows, dtype=np.int32), counts)
+
+    def _set_postings(self, gram_ids, rows):
+        # Posting lists stored CSR-style: rows of trigram g are postings[offsets[g]:offsets[g + 1]]
+        self.postings = rows[np.argsort(gram_ids, kind="stable")]
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(gram_ids, minlength=len(self.vocabulary)), out=self.offsets[1:])
+
+    def updated(self, choices, rows):
+        """A new index over ``choices`` in which only positions ``rows`` are new or changed.
+
+        The postings of every other row are reused as they are, so an
+        ingested delta costs time in proportion to its own size plus one
+        vectorized merge. This index is left untouched for readers still using it.
+        """
+        index = object.__new__(type(self))
+        index.choices = pd.Series(choices).fillna("").reset_index(drop=True)
+        index.vocabulary = dict(self.vocabulary)
+        rows = np.asarray(rows, dtype=np.int32)
+        old_grams = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int32), np.diff(self.offsets))
+        keep = ~np.isin(self.postings, rows)
+        new_grams, new_rows = index._postings(rows)
+        index._set_postings(np.concatenate([old_grams[keep], new_grams]),
+                            np.concatenate([self.postings[keep], new_rows]))
+        return index
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(search_text(data))
+
+    def __len__(self):
+        return len(self.choices)
+
+    def candidates(self, query, limit=CANDIDATES):
+        """Rows sharing the most trigrams with ``query``, best first."""
+        ids = [self.vocabulary[gram] for gram in trigrams(full_process(query)) if gram in self.vocabulary]
+        if not ids:
+            return np.empty(0, dtype=np.intp)
+        hits = np.concatenate([self.postings[self.offsets[i]:self.offsets[i + 1]] for i in ids])
+        counts = np.bincount(hits, minlength=len(self))
+        matched = np.count_nonzero(counts)
+        limit = min(limit, matched)
+        best = np.argpartition(-counts, limit - 1)[:limit]
+        return best[np.argsort(-counts[best], kind="stable")]
+
+    def extract(self, query, limit=LIMIT):
+        """``process.extract(query, choices, limit=limit)`` restricted to the trigram candidates."""
+        rows = self.candidates(query)
+        if not len(rows):
+            return []
+        return process.extract(query, self.choices.iloc[rows], limit=limit)
+
+    def search(self, query, limit=LIMIT, min_score=MIN_SCORE):
+        """Positional rows of the best fuzzy matches scoring above ``min_score``."""
+        return [match[2] for match in self.extract(query, limit) if match[1] > min_score]
@@ -0,0 +1,121 @@
+""""For You" recommendations from a user's whole favorites list.
+
+A ``TasteProfile`` keeps, per taste cluster, the running sum of the unit
+vectors of the favorites assigned to it. Adding or removing a favorite
+updates one sum in O(d), so the profile never re-reads the whole list.
+With ``n_clusters > 1`` the favorites are split with k-means the first
+time, so someone who likes both ambient and metal gets both instead of a
+centroid halfway between them; until there are more favorites than
+clusters, every change refits. New favorites then join their nearest
+cluster, and the clusters are refitted once the favorites have changed
+about as much as the profile last fitted.
+
+Recommendations come from one batched query of every cluster centroid
+against the catalog (see ``RecommendationEngine.recommend_vectors``),
+with the favorites themselves masked out.
+"""
+import numpy as np
+
+from ann_index import kmeans
+from recommender import normalize_rows
+
+# Changes absorbed incrementally before the clusters are refitted
+MIN_REFIT = 8
+
+
+class TasteProfile:
+    """Running taste vectors over a set of favorite catalog rows."""
+
+    def __init__(self, engine, n_clusters=1, seed=0):
+        self.engine = engine
+        self.n_clusters = max(1, int(n_clusters))
+        self.seed = seed
+        dim = np.asarray(engine.vectors_for([0])).shape[1]
+        self.sums = np.zeros((self.n_clusters, dim), dtype=np.float64)
+        self.counts = np.zeros(self.n_clusters, dtype=np.int64)
+        self.labels = {}  # Favorite row -> taste cluster
+        self._changes = 0
+        self._fitted = 0
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, row):
+        return row in self.labels
+
+    def fit(self, rows=None):
+        """Recompute every cluster from ``rows`` (default: the current favorites)."""
+        rows = np.fromiter(self.labels if rows is None else rows, dtype=np.intp)
+        self.sums[:] = 0.0
+        self.counts[:] = 0
+        self.labels = {}
+        if len(rows):
+            vectors = np.asarray(self.engine.vectors_for(rows), dtype=np.float64)
+            if self.n_clusters == 1 or len(rows) <= self.n_clusters:
+                labels = np.arange(len(rows)) % self.n_clusters
+            else:
+                centroids = kmeans(vectors, self.n_clusters, rng=self.seed)
+                labels = (vectors @ centroids.T).argmax(axis=1)
+            np.add.at(self.sums, labels, vectors)
+            self.counts += np.bincount(labels, minlength=self.n_clusters)
+            self.labels = dict(zip(rows.tolist(), labels.tolist()))
+        self._changes = 0
+        self._fitted = len(rows)
+        return self
+
+    def add(self, row):
+        """Add favorite ``row``; returns ``False`` if it was already there."""
+        if row in self.labels:
+            return False
+        vector = np.asarray(self.engine.vectors_for(row), dtype=np.float64)
+        empty = np.flatnonzero(self.counts == 0)
+        if len(empty):
+            label = int(empty[0])  # Spread the first favorites over the clusters
+        else:
+            label = int((normalize_rows(self.sums) @ vector).argmax())
+        self.sums[label] += vector
+        self.counts[label] += 1
+        self.labels[row] = label
+        self._changed()
+        return True
+
+    def remove(self, row):
+        """Remove favorite ``row``; returns ``False`` if it was not there."""
+        label = self.labels.pop(row, None)
+        if label is None:
+            return False
+        self.sums[label] -= np.asarray(self.engine.vectors_for(row), dtype=np.float64)
+        self.counts[label] -= 1
+        if self.counts[label] == 0:
+            self.sums[label] = 0.0  # Drop accumulated rounding error
+        self._changed()
+        return True
+
+    def sync(self, rows):
+        """Bring the profile in line with ``rows``, touching only what changed once it has been fitted."""
+        rows = set(rows)
+        if self._fitted <= self.n_clusters:
+            return self.fit(rows)
+        for row in self.labels.keys() - rows:
+            self.remove(row)
+        for row in rows - self.labels.keys():
+            self.add(row)
+        return self
+
+    def _changed(self):
+        self._changes += 1
+        if self.n_clusters > 1 and (self._fitted <= self.n_clusters or self._changes >= max(MIN_REFIT, self._fitted)):
+            self.fit()
+
+    def centroids(self):
+        """Unit centroid of every non-empty cluster and its share of the favorites."""
+        used = self.counts > 0
+        return normalize_rows(self.sums[used]), self.counts[used] / self.counts.sum()
+
+    def recommend(self, k):
+        """Top-k catalog rows for this taste as ``(indices, similarities)``, favorites excluded."""
+        if not self.labels:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        centroids, _ = self.centroids()
+        exclude = np.fromiter(self.labels, dtype=np.intp)
+        return self.engine.recommend_vectors(centroids, k, exclude=exclude)
@@ -0,0 +1,19 @@
+import numpy as np
+
+from benchmarks.synthetic import make_catalog
+from ingest import merge
+
+
+def test_merge_rejects_rows_with_missing_required_values():
+    data = make_catalog(50)
+    delta = data.iloc[:4].copy()
+    delta["energy"] = 0.5
+    delta.loc[1, "year"] = np.nan
+    delta.loc[2, "tempo"] = np.nan
+
+    merged, changed = merge(data, delta)
+
+    assert changed.tolist() == [0, 3]
+    assert merged["energy"].iloc[[0, 3]].tolist() == [0.5, 0.5]
+    assert merged["energy"].iloc[[1, 2]].tolist() == data["energy"].iloc[[1, 2]].tolist()
+    assert merged["year"].dtype == data["year"].dtype
@@ -0,0 +1,16 @@
+import pytest
+
+from library import LibraryStore, new_user_id, valid_user_id
+
+
+@pytest.mark.parametrize("user", ["../../somewhere", "/tmp/x", "ABCDEF012345", "abc", "", None])
+def test_rejects_user_ids_that_were_not_minted(tmp_path, user):
+    assert not valid_user_id(user)
+    with pytest.raises(ValueError):
+        LibraryStore(tmp_path / "library.sqlite3", user, tmp_path / "exports")
+
+
+def test_exports_stay_under_the_export_dir(tmp_path):
+    user = new_user_id()
+    store = LibraryStore(tmp_path / "library.sqlite3", user, tmp_path / "exports")
+    assert store.export_dir == tmp_path / "exports" / user
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_catalog
+from model_bundle import dataset_fingerprint, load_bundle, save_bundle
+from preprocessing import FEATURES, FeatureScaler, check_against_notebook
+from recommender import RecommendationEngine
+
+ROWS = np.arange(0, 2000, 20)
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_catalog(2000, seed=3)
+
+
+@pytest.fixture(scope="module")
+def engines(data, tmp_path_factory):
+    scaler = FeatureScaler.fit(data)
+    from_catalog = RecommendationEngine.from_catalog(data, scaler)
+    path = tmp_path_factory.mktemp("bundle") / "data_model"
+    save_bundle(path, scaler.transform(data), FEATURES, scaler, dataset_fingerprint(data, FEATURES))
+    return {"catalog": from_catalog, "bundle": RecommendationEngine.from_bundle(load_bundle(path, data), data)}
+
+
+@pytest.mark.parametrize("source", ["catalog", "bundle"])
+def test_served_neighbours_match_the_notebook(data, engines, source):
+    agreement, notebook, served = check_against_notebook(data, engines[source], ROWS)
+
+    assert agreement >= 0.99
+    assert served == pytest.approx(notebook, abs=1e-4)
+
+
+def test_catalog_and_bundle_engines_agree(engines):
+    for row in ROWS:
+        catalog_rows, catalog_scores = engines["catalog"].recommend(row, 6)
+        bundle_rows, bundle_scores = engines["bundle"].recommend(row, 6)
+        np.testing.assert_array_equal(catalog_rows, bundle_rows)
+        np.testing.assert_allclose(catalog_scores, bundle_scores, atol=1e-6)
@@ -0,0 +1,35 @@
+import numpy as np
+
+from recommender import mmr_rerank
+
+
+def candidates(seed=0, pool=8, dim=4):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(pool, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    relevance = np.sort(rng.uniform(0.5, 1.0, pool))[::-1].copy()
+    return relevance, vectors @ vectors.T
+
+
+def test_full_diversity_never_picks_excluded_rows():
+    relevance, pairwise = candidates()
+    excluded = [1, 4, 6]
+    relevance[excluded] = -np.inf
+
+    picks = mmr_rerank(relevance, pairwise, 5, diversity=1.0)
+
+    assert not set(picks.tolist()) & set(excluded)
+    assert len(set(picks.tolist())) == 5
+
+
+def test_full_diversity_batch_takes_excluded_rows_last():
+    relevance, pairwise = candidates()
+    relevance = np.stack([relevance, relevance])
+    relevance[0, [0, 2]] = -np.inf
+    relevance[1, 3:] = -np.inf
+
+    picks = mmr_rerank(relevance, np.stack([pairwise, pairwise]), 5, diversity=1.0)
+
+    assert not set(picks[0].tolist()) & {0, 2}
+    assert set(picks[1, :3].tolist()) == {0, 1, 2}
+    assert len(set(picks[1].tolist())) == 5
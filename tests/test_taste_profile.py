@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from recommender import RecommendationEngine
+from taste_profile import TasteProfile
+
+
+@pytest.fixture
+def engine():
+    rng = np.random.default_rng(0)
+    ambient = rng.normal([5, 0, 0, 0], 0.1, (3, 4))
+    metal = rng.normal([0, 5, 0, 0], 0.1, (3, 4))
+    return RecommendationEngine(np.vstack([ambient, metal, rng.normal(size=(100, 4))]), list("abcd"))
+
+
+@pytest.mark.parametrize("steps", [[6], [1, 6], [1, 2, 3, 4, 5, 6]])
+def test_few_favorites_are_clustered_by_taste(engine, steps):
+    favorites = [0, 3, 1, 4, 2, 5]  # Ambient and metal, interleaved
+    profile = TasteProfile(engine, n_clusters=2)
+    for count in steps:
+        profile.sync(favorites[:count])
+
+    labels = profile.labels
+    assert labels[0] == labels[1] == labels[2]
+    assert labels[3] == labels[4] == labels[5]
+    assert labels[0] != labels[3]
@@ -0,0 +1,125 @@
+"""Seed song lookup: a title hash index and a prefix typeahead.
+
+The Seed Song selectbox used to send every distinct title in the catalog
+to the browser on each render and then find the chosen title with a
+full-column scan, silently taking the first of any duplicates.
+``Typeahead`` is built once per catalog snapshot instead:
+
+* ``rows_named`` maps a normalized title (optionally with an artist) to
+  its rows through a dict;
+* ``complete`` returns the best few rows whose title, any later word of
+  the title, or an artist starts with what was typed.
+
+The prefix structure is a flattened trie: every key (``"love night"``,
+``"night"``, ``"artist 12"``, ...) sits in one sorted array, so the keys
+under a prefix are one contiguous slice found with two binary searches.
+Matches are ranked by where they matched (title start, then later
+title words, then artist), then by popularity. The UI keeps the song
+``id`` of the choice, so the seed resolves through the catalog's id index.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# Options offered per keystroke
+LIMIT = 20
+# Word positions of a title or artist list that are indexed as key starts
+MAX_WORDS = 6
+# Match tiers, best first
+TITLE, TITLE_WORD, ARTIST = 0, 1, 2
+
+
+SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize(text):
+    """Lower case, with runs of punctuation and whitespace collapsed to one space."""
+    return SEPARATORS.sub(" ", str(text)).strip().lower()
+
+
+def normalized(column):
+    """``normalize`` of every row, missing as ""; a categorical is normalized once per category."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = np.asarray([normalize(value) for value in column.cat.categories] + [""], dtype=object)
+        return pd.Series(categories[column.cat.codes.to_numpy()], index=column.index)  # Code -1 picks ""
+    return column.fillna("").map(normalize)
+
+
+def prefix_end(prefix):
+    """Smallest string greater than every string starting with ``prefix``."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class Typeahead:
+    """Title/artist prefix completion and exact title lookup over one catalog."""
+
+    def __init__(self, data):
+        # Read a row at a time for labels, rather than copied out as an array of strings
+        self.names = data["name"]
+        self.artists = data["artists"] if "artists" in data.columns else None
+        titles = normalized(data["name"])
+        self.titles = titles.groupby(titles, sort=False).indices  # Title -> rows, the hash index
+
+        keys, rows, tiers = [], [], []
+        columns = [(titles, TITLE)]
+        if self.artists is not None:
+            columns.append((normalized(data["artists"]), ARTIST))
+        for texts, tier in columns:
+            for row, text in enumerate(texts.tolist()):
+                start = 0
+                for word in range(MAX_WORDS):
+                    keys.append(text[start:])
+                    rows.append(row)
+                    tiers.append(TITLE_WORD if tier == TITLE and word else tier)
+                    start = text.find(" ", start) + 1
+                    if not start:
+                        break
+        order = pd.Series(keys, dtype="str").argsort(kind="stable").to_numpy()
+        self.keys = np.asarray(keys, dtype=object)[order]
+        self.rows = np.asarray(rows, dtype=np.int32)[order]
+
+        popularity = data["popularity"].to_numpy(dtype=np.float64) if "popularity" in data.columns \
+            else np.zeros(len(data))
+        # Lower is better: the tier dominates, popularity (0-100) breaks ties within it
+        self.rank = np.asarray(tiers, dtype=np.float64)[order] * 1000.0 - popularity[self.rows]
+        self.popular = np.argsort(-popularity, kind="stable")[:LIMIT]
+
+    def __len__(self):
+        return len(self.names)
+
+    def rows_named(self, name, artist=None):
+        """Rows whose title is ``name`` (after normalization), optionally by ``artist``."""
+        rows = self.titles.get(normalize(name), np.empty(0, dtype=np.intp))
+        if artist is not None and self.artists is not None:
+            rows = rows[[artist in str(self.artists.iat[row]) for row in rows]]
+        return rows
+
+    def complete(self, query, limit=LIMIT):
+        """Up to ``limit`` rows matching ``query`` as a prefix, best first.
+
+        An empty query offers the most popular songs.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return self.popular[:limit]
+        start = np.searchsorted(self.keys, prefix, side="left")
+        stop = np.searchsorted(self.keys, prefix_end(prefix), side="left")
+        rank, rows = self.rank[start:stop], self.rows[start:stop]
+        # A row has at most one key per indexed word, so this many best keys hold ``limit`` rows
+        pool = limit * 2 * MAX_WORDS
+        if len(rank) > pool:
+            best = np.argpartition(rank, pool - 1)[:pool]
+            rank, rows = rank[best], rows[best]
+        # A row can match several keys; keep its best one
+        order = np.argsort(rank, kind="stable")
+        rows = rows[order]
+        _, first = np.unique(rows, return_index=True)
+        return rows[np.sort(first)][:limit]
+
+    def label(self, row):
+        """What the picker shows for ``row``: title and artists."""
+        if self.artists is None:
+            return str(self.names.iat[row])
+        artists = str(self.artists.iat[row]).strip("[]").replace("'", "")
+        return f"{self.names.iat[row]} - {artists}"